@@ -1 +1,5 @@
-from blender.blender import Blender, SelfIntersectingMeshError
+from blender.blender import Blender, SelfIntersectingMeshError, StageTimeoutError
+from blender.batch import BatchJob, BatchResult
+from blender.journal import BatchJournal
+from blender.obj_scan import InvalidMeshError, ObjStats, scan_obj
+from blender.async_blender import AsyncBlender
@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from blender.batch import plan_batch, run_job_async
+from blender.dag import StageScheduler
+from blender.journal import BatchJournal
+from blender.blender import Blender, SelfIntersectingMeshError, Stage, StageTimeoutError
+from blender.launch import LAUNCH_PROFILES, POLL_INTERVAL, SCRIPT_DIR, EventsFile, ProcessOutput, ProcessResult, \
+    Watchdog, blender_command
+from blender.metrics import peak_rss
+from blender.remesh_search import RemeshSearch
+from blender.tiles import TileEncoder
+
+
+_ADMISSION_POLL_INTERVAL = .5
+
+
+class AsyncBlender(Blender):
+    """
+    Blender for asyncio, its stage methods return coroutines which run Blender as an asyncio subprocess
+     instead of blocking the event loop. Paths are checked when a stage method is called, before it's awaited.
+    Cancelling a stage kills its Blender. On Windows this needs the proactor event loop, the default
+     since Python 3.8.
+    """
+    def __init__(self, blender_path: str, reprocess_existing=True, max_concurrency: int=None, cache_dir=None,
+                 cache_size: int=50 * 2**30, mesh_cache_dir=None, metrics_path=None, metrics_callback=None,
+                 memory_budget: int=None, timeouts: dict=None, heartbeat_timeout: float=60, retries=0,
+                 retry_backoff: float=10, progress_callback=None, bake_profile=None,
+                 launch_profiles: Optional[dict]=LAUNCH_PROFILES):
+        """
+        :param max_concurrency: Number of Blender processes allowed to run at once, defaults to the number
+         of cores.
+        Other parameters are the same as Blender, worker processes aren't supported.
+        """
+        super().__init__(blender_path, reprocess_existing, cache_dir=cache_dir, cache_size=cache_size,
+                         mesh_cache_dir=mesh_cache_dir, metrics_path=metrics_path,
+                         metrics_callback=metrics_callback, memory_budget=memory_budget, timeouts=timeouts,
+                         heartbeat_timeout=heartbeat_timeout, retries=retries, retry_backoff=retry_backoff,
+                         progress_callback=progress_callback, bake_profile=bake_profile,
+                         launch_profiles=launch_profiles)
+        self.max_concurrency = max_concurrency or os.cpu_count()
+        self._semaphore = None
+
+    async def __aenter__(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    async def run_batch(self, jobs: list, preflight=False, max_triangles: int=None, adjust_job=None,
+                        journal_path=None, resource_limits: dict=None) -> list:
+        """
+        Run jobs concurrently, each job runs its steps in order. A stage raising only stops its own job.
+        :param jobs: List of BatchJob.
+        :param preflight: See Blender.run_batch, jobs are started largest first for max_concurrency.
+        :param max_triangles: See Blender.run_batch.
+        :param adjust_job: See Blender.run_batch.
+        :param journal_path: See Blender.run_batch.
+        :param resource_limits: See Blender.run_batch.
+        :return: List of BatchResult, in the same order as jobs.
+        """
+        logging.info(f'START BATCH OF {len(jobs)} JOBS')
+        results = [None] * len(jobs)
+        planned = list(enumerate(jobs))
+        if preflight:
+            planned, rejected = await asyncio.get_event_loop().run_in_executor(
+                None, plan_batch, jobs, max_triangles, adjust_job)
+            for index, result in rejected.items():
+                logging.info(f'REJECTED JOB {result.name}: {result.error}')
+                results[index] = result
+        journal = BatchJournal(journal_path) if journal_path is not None else None
+        try:
+            if resource_limits is not None:
+                planned_results = await StageScheduler(resource_limits).run_async(
+                    self, [job for _, job in planned], journal)
+            else:
+                planned_results = await asyncio.gather(*(run_job_async(self, job, journal) for _, job in planned))
+        finally:
+            if journal is not None:
+                journal.close()
+        for (index, _), result in zip(planned, planned_results):
+            results[index] = result
+        failed = [result.name for result in results if not result.ok]
+        logging.info(f'BATCH OK, {len(failed)} FAILED: {failed}')
+        return results
+
+    async def _execute(self, stage: Stage):
+        if stage.skip_message is not None:
+            logging.info(stage.skip_message)
+            return
+        logging.info(f'START {stage.name}')
+        start = time.perf_counter()
+        process = await self._run_stage_async(stage)
+        self._record_metrics(stage, process, time.perf_counter() - start)
+        if process.killed_reason is not None:
+            raise StageTimeoutError(f'{stage.name} {process.killed_reason}')
+        self._raise_for_returncode(stage, process)
+        logging.info(f'{stage.name} OK')
+
+    async def _execute_parallel(self, stages: list, then: Stage=None, max_parallel: int=None,
+                                encoder: TileEncoder=None):
+        semaphore = asyncio.Semaphore(max_parallel or len(stages))
+
+        async def execute(stage):
+            async with semaphore:
+                await self._execute(stage)
+        if encoder is not None:
+            encoder.start()
+        try:
+            await asyncio.gather(*map(execute, stages))
+        finally:
+            if encoder is not None:
+                encoder.stop()
+        if encoder is not None:
+            await asyncio.get_event_loop().run_in_executor(None, encoder.wait)
+        if then is not None:
+            await self._execute(then)
+
+    async def _run_remesh_search(self, search: RemeshSearch):
+        tasks = {asyncio.ensure_future(self._execute(stage)): i for i, stage in enumerate(search.stages)}
+        try:
+            winner = None
+            pending = set(tasks)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    winner = search.finish(tasks[task], task.exception())
+                    if winner is not None:
+                        break
+            if winner is None:
+                raise search.error(SelfIntersectingMeshError(f'Every remesh candidate is self intersecting:'
+                                                             f' {search.candidates}'))
+            return search.keep(winner)
+        finally:
+            # cancelling a stage kills its Blender
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            search.remove()
+
+    async def _run_stage_async(self, stage: Stage) -> ProcessResult:
+        if self.cache is None:
+            return await self._run_retrying_async(stage)
+        # hashing inputs and copying outputs is blocking file IO
+        loop = asyncio.get_event_loop()
+        key = await loop.run_in_executor(None, self.cache.key, stage.python_filename, stage.input_paths,
+                                         stage.args)
+        if await loop.run_in_executor(None, self.cache.restore, key, stage.output_paths):
+            logging.info(f'CACHE HIT FOR {stage.python_filename}: {stage.output_paths[0]}')
+            return ProcessResult(stage.args, 0, cached=True)
+        process = await self._run_retrying_async(stage)
+        if process.returncode == 0:
+            await loop.run_in_executor(None, self.cache.store, key, stage.output_paths)
+        return process
+
+    async def _run_retrying_async(self, stage: Stage) -> ProcessResult:
+        process = await self._run_admitted_async(stage)
+        for retry in range(self.retries):
+            if process.killed_reason is None:
+                break
+            backoff = self.retry_backoff * 2**retry
+            logging.info(f'{stage.name} {process.killed_reason}, RETRYING IN {backoff}s')
+            await asyncio.sleep(backoff)
+            process = await self._run_admitted_async(stage)
+        return process
+
+    async def _run_admitted_async(self, stage: Stage) -> ProcessResult:
+        if self.scheduler is None:
+            return await self._run_process_async(stage.python_filename, *stage.args, watchdog=self._watchdog(stage),
+                                                 on_event=self._event_callback(stage))
+        base_estimate = self.scheduler.base_estimate(stage.input_paths, stage.texture_pixels)
+        estimate = self.scheduler.estimate(stage.python_filename, base_estimate)
+        while not self.scheduler.try_acquire(estimate):
+            await asyncio.sleep(_ADMISSION_POLL_INTERVAL)
+        try:
+            process = await self._run_process_async(stage.python_filename, *stage.args,
+                                                    watchdog=self._watchdog(stage),
+                                                    on_event=self._event_callback(stage))
+        finally:
+            self.scheduler.release(estimate)
+        self.scheduler.learn(stage.python_filename, base_estimate, peak_rss(process))
+        return process
+
+    async def _run_process_async(self, python_filename: str, *args, watchdog: Watchdog=None,
+                                 on_event=None) -> ProcessResult:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        watchdog = watchdog or Watchdog()
+        profile = self._launch_profile(python_filename)
+        args = blender_command(self.blender_path, python_filename, *args, profile=profile)
+        async with self._semaphore:
+            events = EventsFile(on_event)
+            launch_time = time.time()
+            process = await asyncio.create_subprocess_exec(
+                *args, cwd=str(SCRIPT_DIR), env=dict(profile.env(self._env), PHOTOGRAMMETRY_EVENTS=str(events.path)),
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+            watchdog.start()
+            output = ProcessOutput(f'{python_filename} {process.pid}')
+            output.drain_async(process)
+            # one wait on the process, polled so the watchdog is checked while it runs
+            wait_task = asyncio.ensure_future(process.wait())
+            try:
+                while True:
+                    await asyncio.wait({wait_task}, timeout=POLL_INTERVAL)
+                    if wait_task.done():
+                        returncode = wait_task.result()
+                        break
+                    watchdog.events(events.read_new())
+                    if watchdog.expired():
+                        process.kill()
+            except asyncio.CancelledError:
+                process.kill()
+                await wait_task
+                await output.join_async()
+                events.close()
+                raise
+            await output.join_async()
+        return ProcessResult(args, returncode, stderr=output.stderr.text(), events=events.close(),
+                             launch_time=launch_time, killed_reason=watchdog.reason)
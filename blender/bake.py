@@ -1,17 +1,11 @@
 import bpy
-from operators import AutomateMacro, OBJECT_OT_automate_bake, WM_OT_exit
-import sys
+from operators import AutomateMacro, OBJECT_OT_automate_bake, WM_OT_exit, enable_addons, script_args
 
 
-if __name__ == '__main__':
-    high_poly_path, low_poly_path, cage_path, texture_output_path, base_texture_name, \
-    map_types, width, height, margin, tile_x, tile_y = sys.argv[5:]
-
-    bpy.utils.register_class(OBJECT_OT_automate_bake)
-    bpy.utils.register_class(WM_OT_exit)
-    bpy.utils.register_class(AutomateMacro)
-
-    bake = AutomateMacro.define('OBJECT_OT_automate_bake')
+def define(macro, high_poly_path, low_poly_path, cage_path, texture_output_path, base_texture_name,
+           map_types, width, height, margin, tile_x, tile_y, threads=0, export='True', region='',
+           texture_format='PNG', encode_on_host='False'):
+    bake = macro.define('OBJECT_OT_automate_bake')
     bake.properties.high_poly_path = high_poly_path
     bake.properties.low_poly_path = low_poly_path
     bake.properties.cage_path = cage_path
@@ -20,8 +14,24 @@ if __name__ == '__main__':
     bake.properties.map_types = map_types
     bake.properties.width = int(width)
     bake.properties.height = int(height)
-    bake.properties.margin = float(margin)
+    bake.properties.margin = int(margin)
     bake.properties.tile_x = int(tile_x)
     bake.properties.tile_y = int(tile_y)
+    bake.properties.threads = int(threads)
+    bake.properties.export = export == 'True'
+    if region:
+        bake.properties.region = tuple(map(int, region.split(',')))
+    bake.properties.texture_format = texture_format
+    bake.properties.encode_on_host = encode_on_host == 'True'
+    return bake
+
+
+if __name__ == '__main__':
+    enable_addons()
+    bpy.utils.register_class(OBJECT_OT_automate_bake)
+    bpy.utils.register_class(WM_OT_exit)
+    bpy.utils.register_class(AutomateMacro)
+
+    define(AutomateMacro, *script_args())
     AutomateMacro.define('WM_OT_exit')
     bpy.ops.wm.automation_macro()
@@ -0,0 +1,23 @@
+import bpy
+from operators import AutomateMacro, OBJECT_OT_automate_bake_material, WM_OT_exit, enable_addons, script_args
+
+
+def define(macro, low_poly_path, texture_output_path, base_texture_name, map_types, texture_format='PNG'):
+    bake_material = macro.define('OBJECT_OT_automate_bake_material')
+    bake_material.properties.low_poly_path = low_poly_path
+    bake_material.properties.output_path = texture_output_path
+    bake_material.properties.base_texture_name = base_texture_name
+    bake_material.properties.map_types = map_types
+    bake_material.properties.texture_format = texture_format
+    return bake_material
+
+
+if __name__ == '__main__':
+    enable_addons()
+    bpy.utils.register_class(OBJECT_OT_automate_bake_material)
+    bpy.utils.register_class(WM_OT_exit)
+    bpy.utils.register_class(AutomateMacro)
+
+    define(AutomateMacro, *script_args())
+    AutomateMacro.define('WM_OT_exit')
+    bpy.ops.wm.automation_macro()
@@ -0,0 +1,127 @@
+import argparse
+from contextlib import contextmanager
+import json
+import math
+import os
+from pathlib import Path
+import platform
+import sys
+from threading import Lock
+from typing import NamedTuple, Optional
+
+
+class BakeSettings(NamedTuple):
+    """
+    :param tile_x: Horizontal tile size.
+    :param tile_y: Vertical tile size.
+    :param threads: Render threads, 0 lets Blender use every core.
+    :param seconds: Seconds the calibration bake took with these settings.
+    """
+    tile_x: int
+    tile_y: int
+    threads: int
+    seconds: float
+
+
+def machine_key() -> str:
+    """Identifies the machine in a profile shared between nodes, by host name, processor and cores."""
+    return f'{platform.node()}/{platform.processor() or platform.machine()}/{os.cpu_count()} cores'
+
+
+class BakeProfile:
+    """
+    Fastest bake settings measured by Blender.tune_bake, stored as JSON at path by machine, then by
+     resolution and map type. Several machines may share one profile file, updates hold a lock on
+     path with .lock appended while they re-read and write it.
+    """
+    def __init__(self, path, machine: str=None):
+        """:param machine: Key of the machine whose settings are used, defaults to machine_key()."""
+        self.path = Path(path)
+        self.machine = machine or machine_key()
+        self._lock = Lock()
+        self.profiles = json.loads(self.path.read_text()) if self.path.exists() else {}
+
+    def settings(self, width: int, height: int, map_types: str) -> Optional[BakeSettings]:
+        """
+        Settings for baking map_types at width x height on this machine, taken from the closest resolution
+         measured. Of the map types measured at it, the slowest one's settings are used, it's the one which
+         matters most for a bake of all of them. None if nothing was measured on this machine.
+        """
+        measured = {}
+        for key, settings in self.profiles.get(self.machine, {}).items():
+            resolution, map_type = key.split()
+            measured.setdefault(resolution, {})[map_type] = BakeSettings(**settings)
+        if not measured:
+            return None
+        resolution = min(measured, key=lambda resolution: abs(math.log(_pixels(resolution) / (width * height))))
+        candidates = [measured[resolution][map_type] for map_type in map_types.split()
+                      if map_type in measured[resolution]] or list(measured[resolution].values())
+        return max(candidates, key=lambda settings: settings.seconds)
+
+    def update(self, width: int, height: int, map_type: str, settings: BakeSettings):
+        """Record settings for this machine and save the profile, keeping other machines' settings in the file."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # the thread lock as well, file locks don't exclude threads of the process holding them
+        with self._lock, _file_lock(self.path.with_name(f'{self.path.name}.lock')):
+            if self.path.exists():
+                self.profiles = json.loads(self.path.read_text())
+            self.profiles.setdefault(self.machine, {})[f'{width}x{height} {map_type}'] = settings._asdict()
+            partial_path = self.path.with_name(f'{self.path.name}.{os.getpid()}.partial')
+            partial_path.write_text(json.dumps(self.profiles, indent=2, sort_keys=True))
+            os.replace(partial_path, self.path)
+
+
+@contextmanager
+def _file_lock(path):
+    """Hold an exclusive lock on the file at path, creating it, against other processes and machines."""
+    with open(path, 'a+b') as lock_file:
+        if sys.platform == 'win32':
+            import msvcrt
+            lock_file.seek(0)
+            while True:
+                # LK_LOCK gives up after 10 seconds
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            # POSIX record locks, unlike flock, hold on network file systems too
+            fcntl.lockf(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.lockf(lock_file, fcntl.LOCK_UN)
+
+
+def _pixels(resolution: str) -> int:
+    width, height = resolution.split('x')
+    return int(width) * int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the fastest bake tile sizes and thread counts on this '
+                                                 'machine with calibration bakes, and save them to a profile.')
+    parser.add_argument('blender_path', help='Folder containing the Blender executable.')
+    parser.add_argument('profile_path', help='Profile to save, Blender(bake_profile=...) reads it.')
+    parser.add_argument('--resolutions', type=int, nargs='+', default=[1024, 2048, 4096])
+    parser.add_argument('--map-types', nargs='+', default=['NORMAL', 'AO'])
+    parser.add_argument('--tile-sizes', type=int, nargs='+', default=None)
+    parser.add_argument('--threads', type=int, nargs='+', default=None)
+    parser.add_argument('--work-dir', default=None, help='Folder for the synthetic meshes and textures.')
+    args = parser.parse_args()
+
+    # imported here, blender.blender imports this module
+    from blender.blender import Blender
+    Blender(args.blender_path).tune_bake(args.profile_path, args.resolutions, args.map_types, args.tile_sizes,
+                                         args.threads, args.work_dir)
+
+
+if __name__ == '__main__':
+    main()
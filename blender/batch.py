@@ -0,0 +1,208 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+from pathlib import Path
+import time
+from typing import NamedTuple, Optional
+
+from blender.obj_scan import InvalidMeshError, scan_obj
+
+
+_MESH_KWARGS = ('high_poly_path', 'low_poly_path', 'cage_path', 'filepath')
+# stage: kwargs naming the meshes it writes
+_STAGE_OUTPUTS = {'remesh': ('low_poly_path',), 'remesh_auto': ('low_poly_path',), 'create_cage': ('cage_path',),
+                  'process_asset': ('low_poly_path', 'cage_path')}
+# (stage, kwarg) of meshes which must already be unwrapped
+_NEEDS_UVS = {('bake', 'low_poly_path'), ('pack', 'filepath')}
+
+
+def mesh_paths(path_or_paths) -> list:
+    """Stage methods which take several meshes, such as pack, accept a single path as well."""
+    return [path_or_paths] if isinstance(path_or_paths, (str, os.PathLike)) else list(path_or_paths)
+
+
+class BatchJob(NamedTuple):
+    """
+    :param name: Name identifying the asset in results.
+    :param steps: Sequence of (stage, kwargs) run in order, stage is the name of a Blender method
+     such as 'remesh' or 'process_asset'.
+    """
+    name: str
+    steps: list
+
+
+class BatchResult(NamedTuple):
+    """
+    :param name: Name of the job.
+    :param completed: Names of the stages which finished, in order.
+    :param error: Exception raised by the first failing stage, None if every stage finished.
+    :param elapsed: Seconds spent on the job.
+    :param resumed: Names of the completed stages which were skipped, as the journal had them finished.
+    """
+    name: str
+    completed: list
+    error: Optional[Exception]
+    elapsed: float
+    resumed: list = []
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def run_job(blender, job: BatchJob, journal=None) -> BatchResult:
+    """
+    Run each step of job on blender, stopping at the first stage which raises.
+    :param journal: BatchJournal to record the steps in. Steps it has finished are skipped, until the first
+     step which has to run, the steps after it run again as their inputs may have changed.
+    """
+    start = time.perf_counter()
+    completed = []
+    resumed = []
+    for step, (stage, _) in enumerate(job.steps):
+        try:
+            if run_step(blender, job, step, journal, resumable=len(resumed) == step):
+                resumed.append(stage)
+        except Exception as e:
+            return BatchResult(job.name, completed, e, time.perf_counter() - start, resumed)
+        completed.append(stage)
+    return BatchResult(job.name, completed, None, time.perf_counter() - start, resumed)
+
+
+async def run_job_async(blender, job: BatchJob, journal=None) -> BatchResult:
+    """run_job for blenders whose stage methods return coroutines."""
+    start = time.perf_counter()
+    completed = []
+    resumed = []
+    for step, (stage, _) in enumerate(job.steps):
+        try:
+            if await run_step_async(blender, job, step, journal, resumable=len(resumed) == step):
+                resumed.append(stage)
+        except Exception as e:
+            return BatchResult(job.name, completed, e, time.perf_counter() - start, resumed)
+        completed.append(stage)
+    return BatchResult(job.name, completed, None, time.perf_counter() - start, resumed)
+
+
+def run_step(blender, job: BatchJob, step: int, journal=None, resumable=True) -> bool:
+    """
+    Run step of job on blender, recording it in journal.
+    :param resumable: Skip the step if journal has it finished, False once a step it depends on ran again.
+    :return: True if the step was skipped.
+    """
+    stage, kwargs = job.steps[step]
+    if journal is not None:
+        if resumable and journal.is_finished(job.name, step, stage, kwargs):
+            logging.info(f'RESUMED {job.name} {stage}, FINISHED IN AN EARLIER RUN')
+            return True
+        journal.start(job.name, step, stage, kwargs)
+    try:
+        getattr(blender, stage)(**kwargs)
+    except Exception as e:
+        if journal is not None:
+            journal.fail(job.name, step, e)
+        raise
+    if journal is not None:
+        journal.finish(job.name, step, blender.step_outputs(stage, kwargs))
+    return False
+
+
+async def run_step_async(blender, job: BatchJob, step: int, journal=None, resumable=True) -> bool:
+    """run_step for blenders whose stage methods return coroutines."""
+    loop = asyncio.get_event_loop()
+    stage, kwargs = job.steps[step]
+    if journal is not None:
+        # checking and recording outputs hashes files
+        if resumable and await loop.run_in_executor(None, journal.is_finished, job.name, step, stage, kwargs):
+            logging.info(f'RESUMED {job.name} {stage}, FINISHED IN AN EARLIER RUN')
+            return True
+        journal.start(job.name, step, stage, kwargs)
+    try:
+        await getattr(blender, stage)(**kwargs)
+    except Exception as e:
+        if journal is not None:
+            journal.fail(job.name, step, e)
+        raise
+    if journal is not None:
+        await loop.run_in_executor(None, journal.finish, job.name, step, blender.step_outputs(stage, kwargs))
+    return False
+
+
+def step_dependencies(blender, job: BatchJob) -> list:
+    """
+    For each step of job, the set of earlier steps it has to run after: those writing a mesh it reads
+     or writes, and those reading a mesh it writes.
+    :param blender: Blender whose step_outputs gives the files each step writes.
+    """
+    reads = [{str(Path(path)) for name in _MESH_KWARGS if kwargs.get(name) for path in mesh_paths(kwargs[name])}
+             for _, kwargs in job.steps]
+    writes = [{str(Path(path)) for path in blender.step_outputs(stage, kwargs)} for stage, kwargs in job.steps]
+    return [{earlier for earlier in range(step)
+             if writes[earlier] & (reads[step] | writes[step]) or reads[earlier] & writes[step]}
+            for step in range(len(job.steps))]
+
+
+def job_inputs(job: BatchJob) -> dict:
+    """Paths of the meshes job reads which no earlier step of it writes, mapped to whether they need UVs."""
+    written = set()
+    inputs = {}
+    for stage, kwargs in job.steps:
+        outputs = _STAGE_OUTPUTS.get(stage, ())
+        for name in _MESH_KWARGS:
+            if not kwargs.get(name) or name in outputs:
+                continue
+            for path in map(str, mesh_paths(kwargs[name])):
+                if path not in written:
+                    inputs[path] = inputs.get(path, False) or (stage, name) in _NEEDS_UVS
+        written.update(str(path) for name in outputs if name in kwargs for path in mesh_paths(kwargs[name]))
+    return inputs
+
+
+def scan_jobs(jobs: list, max_triangles: int=None, max_workers: int=None) -> list:
+    """
+    Scan the input meshes of jobs with blender.obj_scan.scan_obj.
+    :return: For each job, in order, (list of ObjStats, list of problems with its inputs).
+    """
+    inputs = [job_inputs(job) for job in jobs]
+    paths = sorted({path for job_paths in inputs for path in job_paths if Path(path).exists()})
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        stats = dict(zip(paths, executor.map(lambda path: scan_obj(path, bounds=False), paths)))
+
+    scans = []
+    for job_paths in inputs:
+        job_stats = []
+        problems = []
+        for path, needs_uvs in job_paths.items():
+            if path not in stats:
+                problems.append(f'{path} does not exist')
+                continue
+            path_stats = stats[path]
+            job_stats.append(path_stats)
+            problems += [f'{path} {problem}' for problem in path_stats.problems]
+            if needs_uvs and path_stats.uvs == 0:
+                problems.append(f'{path} has no UVs')
+            if max_triangles is not None and path_stats.triangles > max_triangles:
+                problems.append(f'{path} has {path_stats.triangles} triangles, more than {max_triangles}')
+        scans.append((job_stats, problems))
+    return scans
+
+
+def plan_batch(jobs: list, max_triangles: int=None, adjust_job=None) -> tuple:
+    """
+    Scan the inputs of jobs, rejecting those with problems and ordering the rest by the memory their
+     meshes need, largest first, so the biggest assets don't start last and hold up the end of the batch.
+    :param adjust_job: Function called with each job and the ObjStats of its inputs, returning the job to run.
+    :return: ([(index in jobs, job to run)], {index in jobs: BatchResult of a rejected job})
+    """
+    planned = []
+    rejected = {}
+    for index, (job, (stats, problems)) in enumerate(zip(jobs, scan_jobs(jobs, max_triangles))):
+        if problems:
+            rejected[index] = BatchResult(job.name, [], InvalidMeshError('; '.join(problems)), 0.)
+            continue
+        if adjust_job is not None:
+            job = adjust_job(job, stats)
+        planned.append((sum(path_stats.estimated_memory for path_stats in stats), index, job))
+    planned.sort(key=lambda plan: plan[0], reverse=True)
+    return [(index, job) for _, index, job in planned], rejected
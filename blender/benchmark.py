@@ -0,0 +1,128 @@
+import argparse
+import json
+from pathlib import Path
+import tempfile
+import time
+
+from blender.batch import BatchJob
+from blender.blender import Blender
+from blender.obj_scan import scan_obj
+from blender.simulated_blender import is_simulated, write_simulated_blender
+from blender.synthetic import write_scan_pair
+
+
+def benchmark_geometry(blender_path, directory, densities=(64, 128, 256), shapes=('sphere', 'grid'),
+                       repeats=1) -> list:
+    """
+    Time the geometry create_cage runs on synthetic scans of each shape and density: checking the cage for
+     self intersections, pushing it out to the high poly ('raycast') and inflating it past the high poly
+     faces it overlaps ('inflate'). The stage needs no add-ons, so any real Blender will do, a simulated
+     one only replays STAGE_SECONDS and is refused.
+    :param blender_path: Blender to run on.
+    :param directory: Folder to write the scans and cages to.
+    :param densities: Quads along each high poly, see synthetic.write_scan_pair.
+    :return: A dict for each run, with the shape, density, triangles of the high and low poly, the stage's
+     wall_seconds and the seconds of each step it timed.
+    """
+    if is_simulated(blender_path):
+        raise ValueError('The geometry benchmark needs a real Blender, a simulated one only replays timings.')
+    metrics = []
+    blender = Blender(blender_path, metrics_callback=metrics.append)
+    rows = []
+    for shape in shapes:
+        for density in densities:
+            name = f'{shape}_{density}'
+            high_poly_path, low_poly_path = write_scan_pair(directory, name, shape, density)
+            cage_path = Path(directory) / f'{name}_cage.obj'
+            for _ in range(repeats):
+                blender.create_cage(str(high_poly_path), str(low_poly_path), str(cage_path))
+                row = {'shape': shape, 'density': density,
+                       'high_poly_triangles': scan_obj(high_poly_path, bounds=False).triangles,
+                       'low_poly_triangles': scan_obj(low_poly_path, bounds=False).triangles,
+                       'wall_seconds': metrics[-1]['wall_seconds']}
+                row.update((step.split('/', 1)[1], seconds) for step, seconds in metrics[-1]['timings'].items())
+                rows.append(row)
+    return rows
+
+
+def benchmark_batch(blender_path, directory, jobs=20, shape='sphere', density=128, target_count=2000,
+                    map_types='NORMAL AO', texture_size=1024, workers=0, max_workers: int=None,
+                    resource_limits: dict=None) -> dict:
+    """
+    Remesh, unwrap, pack, build a cage for and bake jobs synthetic scans with run_batch, to load test the
+     batch schedulers and worker pools. Against a simulated Blender this measures the orchestration alone.
+    :param blender_path: Blender to run on, a real one or one written by simulated_blender.write_simulated_blender.
+    :param directory: Folder to write the scans, their outputs and textures to.
+    :param workers: Blender worker processes, see Blender.
+    :param max_workers: Passed to run_batch, as is resource_limits.
+    :return: dict with the number of jobs, those failed, wall_seconds, jobs_per_hour and the stage_seconds
+     of each stage, summed over the jobs.
+    """
+    directory = Path(directory)
+    margin = 4
+    batch_jobs = []
+    for job_index in range(jobs):
+        name = f'scan_{job_index}'
+        high_poly_path, low_poly_path = map(str, write_scan_pair(directory, name, shape, density, seed=job_index))
+        cage_path = str(directory / f'{name}_cage.obj')
+        batch_jobs.append(BatchJob(name, [
+            ('remesh', {'high_poly_path': high_poly_path, 'low_poly_path': low_poly_path,
+                        'target_count': target_count}),
+            ('unwrap', {'filepath': low_poly_path}),
+            ('pack', {'filepath': low_poly_path, 'margin': margin / texture_size, 'heuristic_search_time': 2}),
+            ('create_cage', {'high_poly_path': high_poly_path, 'low_poly_path': low_poly_path,
+                             'cage_path': cage_path}),
+            ('bake', {'high_poly_path': high_poly_path, 'low_poly_path': low_poly_path, 'cage_path': cage_path,
+                      'texture_output_path': str(directory / 'textures'), 'base_texture_name': name,
+                      'map_types': map_types, 'width': texture_size, 'height': texture_size, 'margin': margin}),
+        ]))
+
+    metrics = []
+    with Blender(blender_path, workers=workers, metrics_callback=metrics.append) as blender:
+        start = time.perf_counter()
+        results = blender.run_batch(batch_jobs, max_workers=max_workers, resource_limits=resource_limits)
+        wall_seconds = time.perf_counter() - start
+    stage_seconds = {}
+    for stage in metrics:
+        stage_seconds[stage['stage']] = stage_seconds.get(stage['stage'], 0) + stage['wall_seconds']
+    return {'jobs': jobs, 'failed': sum(result.error is not None for result in results),
+            'wall_seconds': wall_seconds, 'jobs_per_hour': 3600 * jobs / wall_seconds, 'stage_seconds': stage_seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the cage geometry, or load test batches, on '
+                                                 'synthetic scans. Without --blender-path batches run on a '
+                                                 'simulated Blender which replays how long stages take, '
+                                                 'the geometry benchmark needs a real one.')
+    parser.add_argument('benchmark', choices=['geometry', 'batch'])
+    parser.add_argument('--blender-path', default=None, help='Folder containing the Blender executable.')
+    parser.add_argument('--work-dir', default=None, help='Folder for the scans and outputs.')
+    parser.add_argument('--speed', type=float, default=10., help='How much faster the simulated Blender runs.')
+    parser.add_argument('--failure-rate', type=float, default=0., help='Fraction of simulated stages which fail.')
+    parser.add_argument('--shapes', nargs='+', default=['sphere', 'grid'], choices=['sphere', 'grid'])
+    parser.add_argument('--densities', type=int, nargs='+', default=[64, 128, 256])
+    parser.add_argument('--repeats', type=int, default=1)
+    parser.add_argument('--jobs', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=0)
+    parser.add_argument('--max-workers', type=int, default=None)
+    parser.add_argument('--limits', nargs='*', default=None, metavar='RESOURCE=LIMIT',
+                        help='Schedule steps as a graph with these resource limits, for example render=1 python=4.')
+    args = parser.parse_args()
+    if args.benchmark == 'geometry' and args.blender_path is None:
+        parser.error('the geometry benchmark times real Blender runs, pass --blender-path')
+
+    work_dir = Path(args.work_dir or tempfile.mkdtemp(prefix='photogrammetry_benchmark_'))
+    blender_path = args.blender_path or write_simulated_blender(work_dir / 'simulated', args.speed,
+                                                                failure_rate=args.failure_rate)
+    if args.benchmark == 'geometry':
+        result = benchmark_geometry(blender_path, work_dir, args.densities, args.shapes, args.repeats)
+    else:
+        limits = None if args.limits is None else \
+            {resource: int(limit) for resource, limit in (pair.split('=') for pair in args.limits)}
+        result = benchmark_batch(blender_path, work_dir, args.jobs, args.shapes[0], args.densities[0],
+                                 workers=args.workers, max_workers=args.max_workers, resource_limits=limits)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
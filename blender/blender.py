@@ -1,25 +1,146 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import inspect
 import logging
 import os
 from pathlib import Path
-from subprocess import DEVNULL, PIPE, Popen
+import tempfile
+from subprocess import PIPE, Popen, TimeoutExpired
+from threading import Event
+import time
+from typing import NamedTuple, Optional
+
+from blender.bake_profile import BakeProfile, BakeSettings
+from blender.batch import mesh_paths, plan_batch, run_job
+from blender.cache import StageCache
+from blender.dag import StageScheduler
+from blender.journal import BatchJournal
+from blender.launch import LAUNCH_PROFILES, POLL_INTERVAL, SCRIPT_DIR, USER_PROFILE, WORKER_PROFILE, EventsFile, \
+    LaunchProfile, ProcessOutput, ProcessResult, Watchdog, blender_command, blender_executable, failure_message
+from blender.metrics import MetricsRecorder, peak_rss, stage_metrics
+from blender.pool import WorkerPool
+from blender.remesh_search import RemeshSearch, remesh_candidates
+from blender.scheduler import MemoryScheduler
+from blender.synthetic import write_bake_scene
+from blender.tiles import TileEncoder, region_windows, tile_path
 
 
 logging.basicConfig(level=logging.DEBUG)
 
 
+# texture_format: extension, mirrors operators.TEXTURE_FORMATS
+_TEXTURE_EXTENSIONS = {'PNG': '.png', 'PNG16': '.png', 'EXR_HALF': '.exr', 'EXR': '.exr', 'TIFF': '.tif'}
+# used when neither the caller nor the bake profile give settings
+_DEFAULT_BAKE_SETTINGS = BakeSettings(256, 256, 0, 0.)
+_CALIBRATION_TILE_SIZES = (32, 64, 128, 256, 512)
+# bits per channel of the texture_formats which can be encoded outside Blender
+_HOST_BIT_DEPTHS = {'PNG': 8}
+# stage method: arguments naming the meshes it writes, including those it changes in place
+_WRITTEN_MESHES = {'remesh': ('low_poly_path',), 'remesh_auto': ('low_poly_path',), 'unwrap': ('filepath',),
+                   'pack': ('filepath',), 'create_cage': ('cage_path',), 'bake': ('low_poly_path',),
+                   'generate_lod': ('output_path',), 'process_asset': ('low_poly_path', 'cage_path', 'lod_path')}
+
+
 class SelfIntersectingMeshError(Exception): pass
 
 
+class StageTimeoutError(Exception): pass
+
+
+class Stage(NamedTuple):
+    """
+    A stage script to run in Blender.
+    :param name: Name used in logs.
+    :param python_filename: Script in this folder which runs the stage.
+    :param args: Arguments passed to the script.
+    :param input_paths: Files the stage reads, used to key the cache.
+    :param output_paths: Files the stage writes.
+    :param errors: Exceptions to raise for return codes of the script.
+    :param raise_on_failure: Raise RuntimeError for any other non zero return code.
+    :param skip_message: Logged instead of running the stage, when its output is kept.
+    :param texture_pixels: Pixels of all the textures the stage bakes, for estimating its memory.
+    :param cancel: threading.Event which kills the stage's Blender when set.
+    """
+    name: str
+    python_filename: str
+    args: tuple
+    input_paths: list
+    output_paths: list
+    errors: dict = {}
+    raise_on_failure: bool = False
+    skip_message: Optional[str] = None
+    texture_pixels: int = 0
+    cancel: Optional[Event] = None
+
+
 class Blender:
-    def __init__(self, blender_path: str, reprocess_existing=True):
-        self.blender_path = os.path.join(blender_path, 'blender.exe')
+    def __init__(self, blender_path: str, reprocess_existing=True, workers=0, cache_dir=None,
+                 cache_size: int=50 * 2**30, mesh_cache_dir=None, metrics_path=None, metrics_callback=None,
+                 memory_budget: int=None, timeouts: dict=None, heartbeat_timeout: float=60, retries=0,
+                 retry_backoff: float=10, progress_callback=None, bake_profile=None,
+                 launch_profiles: Optional[dict]=LAUNCH_PROFILES):
+        """
+        :param blender_path: Absolute path to the folder containing the Blender executable, or to the executable.
+        :param reprocess_existing: Remesh and create cages even if the output already exists.
+        :param workers: Number of long lived Blender processes to start when entering the context,
+         stages are then run by an idle worker instead of a new Blender. 0 starts a Blender per stage.
+        :param cache_dir: Folder to cache stage outputs in, keyed on the content of their inputs and
+         their arguments. A stage whose key is cached restores its outputs without running Blender.
+        :param cache_size: Size in bytes the cache is kept under, least recently used outputs are removed.
+        :param mesh_cache_dir: Folder where Blender keeps a .blend of each large .obj it imports, which is
+         loaded instead of parsing the .obj again while the .obj is unchanged.
+        :param metrics_path: File to append a JSON line of metrics to for every stage run, see
+         metrics.stage_metrics for its fields.
+        :param metrics_callback: Function called with the metrics dict of every stage run.
+        :param memory_budget: Bytes of memory Blender processes may use together. Stages wait to start until
+         their estimated peak memory fits, see scheduler.MemoryScheduler. None starts them straight away.
+        :param timeouts: Seconds each stage script may run for before Blender is killed, by script name,
+         for example {'remesh': 1800, 'bake': 7200}. Scripts not in it run for as long as they take.
+        :param heartbeat_timeout: Seconds Blender may go without a heartbeat while remesh or pack wait on their
+         add-on before it's killed as hung, None to never kill it.
+        :param retries: Number of times to run a stage again after it was killed, before raising StageTimeoutError.
+        :param retry_backoff: Seconds to wait before the first retry, doubled for each one after it.
+        :param progress_callback: Function called with each event the operators report while a stage runs,
+         with the stage's name added as 'name', from the thread running the stage. 'progress' events have
+         the percent of the operator done, 'error' events the reason it's failing, see operators.emit.
+        :param bake_profile: Profile written by tune_bake, bake and process_asset take the tile size and
+         threads measured fastest on this machine from it when they aren't given.
+        :param launch_profiles: Stage script: LaunchProfile, how Blender is started for it, see
+         launch.LAUNCH_PROFILES. By default stages which don't wait on an add-on run in the background, and
+         every stage only loads the add-ons it needs. None starts every stage with a window and the user's
+         preferences and add-ons.
+        """
+        self.blender_path = blender_executable(blender_path)
         self.reprocess_existing = reprocess_existing
+        self.workers = workers
+        self.cache = StageCache(cache_dir, cache_size) if cache_dir is not None else None
+        self.metrics = None
+        if metrics_path is not None or metrics_callback is not None:
+            self.metrics = MetricsRecorder(metrics_path, metrics_callback)
+        self._env = dict(os.environ)
+        if mesh_cache_dir is not None:
+            self._env['PHOTOGRAMMETRY_MESH_CACHE'] = str(mesh_cache_dir)
+        self.scheduler = MemoryScheduler(memory_budget) if memory_budget is not None else None
+        self.timeouts = timeouts or {}
+        self.heartbeat_timeout = heartbeat_timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.progress_callback = progress_callback
+        self.bake_profile = BakeProfile(bake_profile) if bake_profile is not None else None
+        self.launch_profiles = launch_profiles
+        self._pool = None
 
     def __enter__(self):
+        if self.workers:
+            logging.info(f'STARTING {self.workers} BLENDER WORKERS')
+            self._pool = WorkerPool(self.blender_path, self.workers, self._env,
+                                    WORKER_PROFILE if self.launch_profiles is not None else USER_PROFILE)
+            self._pool.start()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        pass
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
 
     def remesh(self, high_poly_path, low_poly_path, target_count=5000, adaptive_size=50,
                hard_edges_by_angle=True, disallow_intersection=True):
@@ -34,56 +155,127 @@ class Blender:
         """
         self._raise_path_not_exists(high_poly_path)
         self._create_path_not_exists(Path(low_poly_path).parent)
-        if self.reprocess_existing or not Path(low_poly_path).exists():
-            logging.info('START REMESH')
-            process = self._run_process('remesh.py', high_poly_path, low_poly_path, target_count,
-                                        adaptive_size, hard_edges_by_angle, disallow_intersection)
-            if process.returncode == 2 and disallow_intersection:
-                raise SelfIntersectingMeshError('Remesh created a self intersecting mesh, try increasing'
-                                                ' target_count or adaptive_size.')
-            logging.info('REMESH OK')
-        else:
-            logging.info(f'SKIPPING REMESH FOR: {low_poly_path}. ALREADY EXISTS')
+        skip_message = None
+        if not self.reprocess_existing and Path(low_poly_path).exists():
+            skip_message = f'SKIPPING REMESH FOR: {low_poly_path}. ALREADY EXISTS'
+        stage = self._remesh_stage(high_poly_path, low_poly_path, target_count, adaptive_size, hard_edges_by_angle,
+                                   disallow_intersection)
+        return self._execute(stage._replace(skip_message=skip_message))
+
+    def remesh_auto(self, high_poly_path, low_poly_path, target_count=5000, adaptive_size=50,
+                    hard_edges_by_angle=True, candidates: list=None, tolerance=0.):
+        """
+        Remesh with several (target_count, adaptive_size) candidates at the same time, instead of retrying
+         after SelfIntersectingMeshError. The candidate kept is the most preferred one which doesn't self
+         intersect and exports its low poly. The others are killed once it is decided.
+        :param high_poly_path: Absolute path of the high poly .obj to remesh.
+        :param low_poly_path: Absolute path to export the resulting .obj to.
+        :param target_count: Desired number of quads.
+        :param adaptive_size: How much quad size adapts locally to curvature.
+        :param hard_edges_by_angle: Detect hard edges by angle.
+        :param candidates: (target_count, adaptive_size) pairs in order of preference, defaults to
+         remesh_search.remesh_candidates of target_count and adaptive_size.
+        :param tolerance: Fraction of target_count a candidate's target_count may differ by, to be kept
+         without waiting for more preferred candidates further from target_count than that.
+        :return: The (target_count, adaptive_size) kept, None if the remesh was skipped.
+         Raises SelfIntersectingMeshError if every candidate self intersects.
+        """
+        self._raise_path_not_exists(high_poly_path)
+        low_poly_path = Path(low_poly_path)
+        self._create_path_not_exists(low_poly_path.parent)
+        if not self.reprocess_existing and low_poly_path.exists():
+            return self._execute(Stage('REMESH', 'remesh.py', (), [], [],
+                                       skip_message=f'SKIPPING REMESH FOR: {low_poly_path}. ALREADY EXISTS'))
+        candidates = candidates or remesh_candidates(target_count, adaptive_size)
+        search_dir = low_poly_path.parent / f'.{low_poly_path.stem}_remesh_candidates'
+        cancel = Event()
+        stages = []
+        for i, (candidate_count, candidate_size) in enumerate(candidates):
+            stage = self._remesh_stage(high_poly_path, search_dir / str(i) / low_poly_path.name, candidate_count,
+                                       candidate_size, hard_edges_by_angle, True)
+            self._create_path_not_exists(search_dir / str(i))
+            stages.append(stage._replace(name=f'REMESH {candidate_count} {candidate_size}', cancel=cancel,
+                                         raise_on_failure=True))
+        search = RemeshSearch(candidates, stages, self._mesh_outputs(low_poly_path), target_count, tolerance,
+                              search_dir, cancel)
+        return self._run_remesh_search(search)
+
+    def _remesh_stage(self, high_poly_path, low_poly_path, target_count, adaptive_size, hard_edges_by_angle,
+                      disallow_intersection) -> Stage:
+        errors = {}
+        if disallow_intersection:
+            errors[2] = SelfIntersectingMeshError('Remesh created a self intersecting mesh, try increasing'
+                                                  ' target_count or adaptive_size.')
+        return Stage('REMESH', 'remesh.py', (high_poly_path, low_poly_path, target_count, adaptive_size,
+                                             hard_edges_by_angle, disallow_intersection),
+                     [high_poly_path], self._mesh_outputs(low_poly_path), errors)
+
+    def _run_remesh_search(self, search: RemeshSearch):
+        try:
+            winner = None
+            with ThreadPoolExecutor(max_workers=len(search.stages)) as executor:
+                futures = {executor.submit(self._execute, stage): i for i, stage in enumerate(search.stages)}
+                for future in as_completed(futures):
+                    winner = search.finish(futures[future], future.exception())
+                    if winner is not None:
+                        search.cancel.set()
+                        break
+            if winner is None:
+                raise search.error(SelfIntersectingMeshError(f'Every remesh candidate is self intersecting:'
+                                                             f' {search.candidates}'))
+            return search.keep(winner)
+        finally:
+            search.remove()
 
     def unwrap(self, filepath):
         """
         :param filepath: Absolute path of the mesh to unwrap UVs for.
         """
-        logging.info('START UNWRAP')
         self._raise_path_not_exists(filepath)
-        process = self._run_process('unwrap.py', filepath)
-        logging.info('UNWRAP OK')
+        return self._execute(Stage('UNWRAP', 'unwrap.py', (filepath,), [filepath], self._mesh_outputs(filepath)))
 
-    def pack(self, filepath, margin: float, heuristic_search_time: int=10):
+    def pack(self, filepath, margin: float, heuristic_search_time: int=10, scale_heuristic: bool=None):
         """
-        :param filepath: Absolute path of the mesh which has active UVs to pack.
+        :param filepath: Absolute path of the mesh which has active UVs to pack, or a list of them to pack
+         one after another in a single Blender session.
         :param margin: Pixel margin/UV spacing used to bake texture.
-        :heuristic_search_time: Amount of time to search for a better pack.
+        :heuristic_search_time: Amount of time to search for a better pack, the most spent on one mesh
+         when scale_heuristic.
+        :param scale_heuristic: Search each mesh for as long as its number of UV islands and faces is worth,
+         meshes with a few islands aren't searched at all. Defaults to True for a list of meshes.
         """
-        logging.info('START PACK')
-        self._raise_path_not_exists(filepath)
-        process = self._run_process('pack.py', filepath, margin, heuristic_search_time)
-        logging.info('PACK OK')
+        filepaths = mesh_paths(filepath)
+        if scale_heuristic is None:
+            scale_heuristic = not isinstance(filepath, (str, os.PathLike))
+        self._raise_path_not_exists(*filepaths)
+        outputs = [output for path in filepaths for output in self._mesh_outputs(path)]
+        name = 'PACK' if len(filepaths) == 1 else f'PACK {len(filepaths)} MESHES'
+        return self._execute(Stage(name, 'pack.py', (filepaths[0], margin, heuristic_search_time, scale_heuristic,
+                                                     *filepaths[1:]), filepaths, outputs))
 
-    def create_cage(self, high_poly_path, low_poly_path, cage_path):
+    def create_cage(self, high_poly_path, low_poly_path, cage_path, inflate_max_iterations=50,
+                    inflate_time_budget: float=60):
         """
         :param high_poly_path: Absolute path to the high poly .obj.
         :param low_poly_path: Absolute path to the low poly .obj.
         :param cage_path: Absolute path to export the cage .obj to.
+        :param inflate_max_iterations: Maximum passes pushing the cage out of faces it overlaps on the high poly.
+        :param inflate_time_budget: Seconds after which no more passes are started.
         """
-        if self.reprocess_existing or not Path(cage_path).exists():
-            logging.info('START CREATE CAGE')
-            self._raise_path_not_exists(high_poly_path, low_poly_path)
-            process = self._run_process('create_cage.py', high_poly_path, low_poly_path, cage_path)
-            if process.returncode == 2:
-                raise SelfIntersectingMeshError(f'Low poly at: {low_poly_path} is self intersecting.'
-                                                ' This must be fixed before creating a cage.')
-            logging.info('CREATE CAGE OK')
-        else:
-            logging.info(f'SKIPPING CREATE CAGE FOR: {cage_path}. ALREADY EXISTS')
+        if not self.reprocess_existing and Path(cage_path).exists():
+            return self._execute(Stage('CREATE CAGE', 'create_cage.py', (), [], [],
+                                       skip_message=f'SKIPPING CREATE CAGE FOR: {cage_path}. ALREADY EXISTS'))
+        self._raise_path_not_exists(high_poly_path, low_poly_path)
+        errors = {2: SelfIntersectingMeshError(f'Low poly at: {low_poly_path} is self intersecting.'
+                                               ' This must be fixed before creating a cage.')}
+        return self._execute(Stage('CREATE CAGE', 'create_cage.py', (high_poly_path, low_poly_path, cage_path,
+                                                                     inflate_max_iterations, inflate_time_budget),
+                                   [high_poly_path, low_poly_path], self._mesh_outputs(cage_path), errors))
 
     def bake(self, high_poly_path, low_poly_path, cage_path, texture_output_path, base_texture_name,
-             map_types: str, width: int, height: int, margin: int, tile_x=256, tile_y=256):
+             map_types: str, width: int, height: int, margin: int, tile_x: int=None, tile_y: int=None,
+             threads: int=None,
+             processes=1, regions=1, texture_format='PNG', encode_on_host=False):
         """
         :param high_poly_path: Absolute path to the high poly .obj.
         :param low_poly_path: Absolute path to the low poly .obj.
@@ -97,36 +289,433 @@ class Blender:
         :param width: Pixel width of textures.
         :param height: Pixel height of textures.
         :param margin: Pixel/UV margin of textures.
-        :param tile_x: Horizontal tile size to use while baking.
-        :param tile_y: Vertical tile size to use while baking.
+        :param tile_x: Horizontal tile size to use while baking, None takes it from the bake profile, or 256.
+        :param tile_y: Vertical tile size to use while baking, None takes it from the bake profile, or 256.
+        :param threads: Render threads to use in total, None takes them from the bake profile, or lets
+         Blender use every core.
+        :param processes: Number of Blender processes to split map_types between, each bakes its maps with
+         an equal share of threads. The textures are then added to the low poly's material by one more
+         Blender, so map types which bake in parallel don't wait on each other's single threaded phases.
+         With regions, the number of regions baked at the same time.
+        :param regions: Split UV space into a regions x regions grid, each baked by its own Blender with
+         only the low poly faces within margin of it and the high poly faces around those. Memory is then
+         bounded by one region instead of the whole texture and high poly, the regions are stitched
+         into the final textures afterwards.
+        :param texture_format: One of: PNG (8 bit, the default), PNG16, EXR_HALF, EXR (32 bit float),
+         TIFF (uncompressed).
+        :param encode_on_host: Compress PNG textures on a pool of threads in this process, while Blender
+         goes on to bake the next map, instead of Blender saving them after each map.
         """
-        logging.info('START BAKE')
+        if not map_types.split():
+            raise ValueError('map_types names no maps to bake.')
+        if processes < 1 or regions < 1:
+            raise ValueError(f'processes and regions must be at least 1, not {processes} and {regions}.')
+        if texture_format not in _TEXTURE_EXTENSIONS:
+            raise ValueError(f'Unknown texture_format: {texture_format}')
+        if (regions > 1 or encode_on_host) and texture_format not in _HOST_BIT_DEPTHS:
+            raise ValueError(f'Only 8 bit PNG textures can be stitched or encoded outside Blender, '
+                             f'not {texture_format}.')
         self._raise_path_not_exists(high_poly_path, low_poly_path, cage_path)
         self._create_path_not_exists(texture_output_path)
-        process = self._run_process('bake.py', high_poly_path, low_poly_path, cage_path,
-                                    texture_output_path, base_texture_name, map_types,
-                                    width, height, margin, tile_x, tile_y)
-        if process.returncode != 0:
-            raise RuntimeError(process.stderr)
-        logging.info('BAKE OK')
-
-    def generate_lod(self, low_poly_path, output_path, number_of_levels=2, level_ratio=.5):
-        logging.info('START GENERATE LOD')
-        self._raise_path_not_exists(low_poly_path)
-        self._create_path_not_exists(Path(output_path).parent)
-        process = self._run_process('generate_lod.py', low_poly_path, output_path, number_of_levels, level_ratio)
+        tile_x, tile_y, threads = self._bake_settings(width, height, map_types, tile_x, tile_y, threads)
+        inputs = [high_poly_path, low_poly_path, cage_path]
+        extension = _TEXTURE_EXTENSIONS[texture_format]
+        textures = self._texture_outputs(texture_output_path, base_texture_name, map_types, extension)
+        material_stage = Stage('BAKE MATERIAL', 'bake_material.py', (low_poly_path, texture_output_path,
+                                                                     base_texture_name, map_types, texture_format),
+                               [low_poly_path] + textures, self._mesh_outputs(low_poly_path), raise_on_failure=True)
+
+        def bake_args(map_types, threads, export=True, window=None):
+            return (high_poly_path, low_poly_path, cage_path, texture_output_path, base_texture_name, map_types,
+                    width, height, margin, tile_x, tile_y, threads, export, ','.join(map(str, window or ())),
+                    texture_format, encode_on_host)
+
+        if regions > 1:
+            windows = region_windows(width, height, regions)
+            process_threads = max(1, (threads or os.cpu_count()) // processes)
+            region_stages = []
+            for window in windows:
+                region_pixels = (window[2] - window[0] + 2 * margin) * (window[3] - window[1] + 2 * margin)
+                region_stages.append(Stage(f'BAKE REGION {window[0]},{window[1]}', 'bake.py',
+                                           bake_args(map_types, process_threads, False, window), inputs,
+                                           [tile_path(texture, window) for texture in textures],
+                                           raise_on_failure=True, texture_pixels=region_pixels * len(textures)))
+            encoder = TileEncoder(textures, width, height, windows, _HOST_BIT_DEPTHS[texture_format])
+            return self._execute_parallel(region_stages, material_stage, processes, encoder)
+
+        whole_texture = [(0, 0, width, height)]
+        encoder = None
+        if encode_on_host:
+            encoder = TileEncoder(textures, width, height, whole_texture, _HOST_BIT_DEPTHS[texture_format])
+
+        def texture_outputs(map_types):
+            outputs = self._texture_outputs(texture_output_path, base_texture_name, map_types, extension)
+            if encode_on_host:
+                return [tile_path(texture, whole_texture[0]) for texture in outputs]
+            return outputs
+
+        map_type_groups = [' '.join(map_types.split()[i::processes]) for i in range(processes)]
+        map_type_groups = [group for group in map_type_groups if group]
+        if len(map_type_groups) == 1:
+            stage = Stage('BAKE', 'bake.py', bake_args(map_types, threads or 0), inputs,
+                          texture_outputs(map_types) + self._mesh_outputs(low_poly_path), raise_on_failure=True,
+                          texture_pixels=width * height * len(textures))
+            if encoder is None:
+                return self._execute(stage)
+            return self._execute_parallel([stage], encoder=encoder)
+
+        process_threads = max(1, (threads or os.cpu_count()) // len(map_type_groups))
+        bake_stages = [Stage(f'BAKE {group}', 'bake.py', bake_args(group, process_threads, False), inputs,
+                             texture_outputs(group), raise_on_failure=True,
+                             texture_pixels=width * height * len(group.split()))
+                       for group in map_type_groups]
+        return self._execute_parallel(bake_stages, material_stage, encoder=encoder)
+
+    def generate_lod(self, low_poly_path, output_path, number_of_levels=2, level_ratio=.5, chain=False):
+        """
+        :param low_poly_path: Absolute path of the low poly, LOD0, or a list of them to generate LODs of one
+         after another in a single Blender session.
+        :param output_path: Absolute path to export every level to together, or a list with one for each low poly.
+        :param level_ratio: Faces each level keeps of the level before it.
+        :param chain: Decimate each level from the previous one with its decimation applied, instead of every
+         level from LOD0, and also export it on its own, see lod_level_paths. Levels exported before from the
+         same low poly and level_ratio are reused, so adding levels only decimates the new ones.
+        """
+        low_poly_paths, output_paths = mesh_paths(low_poly_path), mesh_paths(output_path)
+        if len(low_poly_paths) != len(output_paths):
+            raise ValueError('generate_lod needs an output_path for each low_poly_path.')
+        self._raise_path_not_exists(*low_poly_paths)
+        self._create_path_not_exists(*{Path(path).parent for path in output_paths})
+        outputs = list(output_paths)
+        if chain:
+            outputs += [path for output_path in output_paths
+                        for path in self._lod_outputs(output_path, number_of_levels)]
+        further_paths = [path for paths in zip(low_poly_paths[1:], output_paths[1:]) for path in paths]
+        name = 'GENERATE LOD' if len(low_poly_paths) == 1 else f'GENERATE LOD {len(low_poly_paths)} ASSETS'
+        return self._execute(Stage(name, 'generate_lod.py',
+                                   (low_poly_paths[0], output_paths[0], number_of_levels, level_ratio, chain,
+                                    *further_paths),
+                                   low_poly_paths, outputs, raise_on_failure=True))
+
+    def lod_level_paths(self, output_path, number_of_levels=2) -> list:
+        """Paths generate_lod(chain=True) exports levels 1 and up to on their own, mirrors operators.lod_level_path."""
+        output_path = Path(output_path)
+        return [output_path.with_name(f'{output_path.stem}_LOD{level}.obj') for level in range(1, number_of_levels)]
+
+    def process_asset(self, high_poly_path, low_poly_path, cage_path, texture_output_path, base_texture_name,
+                      map_types: str, width: int, height: int, margin: int, tile_x: int=None, tile_y: int=None,
+                      target_count=5000, adaptive_size=50, hard_edges_by_angle=True, disallow_intersection=True,
+                      heuristic_search_time: int=10, lod_path=None, number_of_levels=2, level_ratio=.5,
+                      checkpoints=(), threads: int=None):
+        """
+        Remesh, unwrap, pack, create a cage, bake and optionally generate LODs in a single Blender session.
+         Meshes stay in memory between stages instead of being exported and imported again by each one.
+        Parameters are the same as the separate stages, pack uses margin / width as its UV margin.
+        :param lod_path: Absolute path to export LODs to, None skips generating LODs.
+        :param checkpoints: Names of stages ('remesh', 'unwrap', 'pack') after which the low poly is also
+         exported. The low poly, cage, textures and LODs are always exported.
+        """
+        self._raise_path_not_exists(high_poly_path)
+        self._create_path_not_exists(Path(low_poly_path).parent, Path(cage_path).parent, texture_output_path)
+        if lod_path:
+            self._create_path_not_exists(Path(lod_path).parent)
+        tile_x, tile_y, threads = self._bake_settings(width, height, map_types, tile_x, tile_y, threads)
+        outputs = self._mesh_outputs(low_poly_path) + self._mesh_outputs(cage_path) + \
+            self._texture_outputs(texture_output_path, base_texture_name, map_types)
+        if lod_path:
+            outputs.append(lod_path)
+        errors = {2: SelfIntersectingMeshError(f'Remesh of: {high_poly_path} is self intersecting, try increasing'
+                                               ' target_count or adaptive_size.')}
+        args = (high_poly_path, low_poly_path, cage_path, texture_output_path, base_texture_name, map_types,
+                width, height, margin, tile_x, tile_y, target_count, adaptive_size, hard_edges_by_angle,
+                disallow_intersection, margin / width, heuristic_search_time, lod_path or '', number_of_levels,
+                level_ratio, ','.join(checkpoints), threads)
+        return self._execute(Stage('PROCESS ASSET', 'process_asset.py', args, [high_poly_path], outputs, errors,
+                                   raise_on_failure=True, texture_pixels=width * height * len(map_types.split())))
+
+    def tune_bake(self, profile_path, resolutions=(1024, 2048, 4096), map_types=('NORMAL', 'AO'),
+                  tile_sizes=None, thread_counts=None, work_dir=None) -> BakeProfile:
+        """
+        Measure the fastest tile size and thread count for baking each map type at each resolution on this
+         machine, with calibration bakes of a synthetic high and low poly, and save them to the profile.
+         Tile sizes are tried with the first thread count, then the other thread counts with the
+         fastest tile size. Also run by python -m blender.bake_profile.
+        :param profile_path: JSON file to save the settings to, see bake_profile.BakeProfile.
+        :param resolutions: Square texture sizes to measure.
+        :param tile_sizes: Square tile sizes to try, defaults to 32 to 512.
+        :param thread_counts: Thread counts to try, defaults to every core, half and a quarter of them.
+        :param work_dir: Folder for the synthetic meshes and textures, a temporary folder by default.
+        :return: The updated profile.
+        """
+        cores = os.cpu_count()
+        tile_sizes = tile_sizes or _CALIBRATION_TILE_SIZES
+        thread_counts = thread_counts or sorted({cores, max(1, cores // 2), max(1, cores // 4)}, reverse=True)
+        profile = BakeProfile(profile_path)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            work_dir = Path(work_dir or temp_dir)
+            scene = write_bake_scene(work_dir)
+            for resolution in resolutions:
+                for map_type in map_types:
+                    def calibrate(tile_size, threads):
+                        return self._calibration_bake(scene, work_dir, resolution, map_type, tile_size, threads)
+                    best = min((calibrate(tile_size, thread_counts[0]) for tile_size in tile_sizes),
+                               key=lambda settings: settings.seconds)
+                    best = min([best] + [calibrate(best.tile_x, threads) for threads in thread_counts[1:]],
+                               key=lambda settings: settings.seconds)
+                    logging.info(f'FASTEST BAKE OF {map_type} AT {resolution}: TILE {best.tile_x}, '
+                                 f'{best.threads} THREADS, {best.seconds:.2f}s')
+                    profile.update(resolution, resolution, map_type, best)
+        return profile
+
+    def _calibration_bake(self, scene: tuple, texture_output_path, resolution: int, map_type: str,
+                          tile_size: int, threads: int) -> BakeSettings:
+        high_poly_path, low_poly_path, cage_path = scene
+        name = f'CALIBRATION BAKE {map_type} AT {resolution}, TILE {tile_size}, {threads} THREADS'
+        process = self._run_process('bake.py', high_poly_path, low_poly_path, cage_path, texture_output_path,
+                                    'calibration', map_type, resolution, resolution, 16, tile_size, tile_size,
+                                    threads, False)
         if process.returncode != 0:
-            raise RuntimeError(process.stderr)
-        logging.info('GENERATE LOD OK')
-
-    def _run_process(self, python_filename: str, *args) -> Popen:
-        py_program_filepath = Path(__file__).parent / python_filename
-        args = [self.blender_path, '--disable-abort-handler', '--python', py_program_filepath, '--'] + list(args)
-        args = list(map(str, args))
-        process = Popen(args=args, cwd=py_program_filepath.parent)
-        process.wait()
+            raise RuntimeError(failure_message(name, process))
+        # only the bake itself, Blender starting and importing the meshes take as long whatever the settings
+        seconds = stage_metrics(name, None, process, 0.)['timings'][f'bake/bake {map_type}']
+        logging.info(f'{name}: {seconds:.2f}s')
+        return BakeSettings(tile_size, tile_size, threads, seconds)
+
+    def run_batch(self, jobs: list, max_workers: int=None, preflight=False, max_triangles: int=None,
+                  adjust_job=None, journal_path=None, resource_limits: dict=None) -> list:
+        """
+        Run jobs concurrently, each job runs its steps in order in one thread, which keeps one Blender
+         busy at a time. A stage raising, for example SelfIntersectingMeshError, only stops its own job.
+        With workers, set max_workers to the number of workers, extra threads wait for an idle worker.
+        :param jobs: List of BatchJob.
+        :param max_workers: Number of jobs to run at once, defaults to the number of cores.
+        :param preflight: Scan the .obj files jobs read before starting any Blender. Jobs with a missing,
+         truncated or empty input, a low poly without UVs or more than max_triangles fail with
+         InvalidMeshError without running, the others run largest first.
+        :param max_triangles: Most triangles an input may have with preflight, None for no limit.
+        :param adjust_job: With preflight, a function called with each job and the ObjStats of its inputs,
+         returning the job to run. For example to pick a target_count from the scan's triangles.
+        :param journal_path: SQLite file to journal the jobs' steps in, see journal.BatchJournal. Running the
+         batch again with the same journal resumes each job after the last step it finished.
+        :param resource_limits: Schedule the steps of all jobs together instead of a thread per job, with
+         this many steps of each resource class running at once, for example {'render': 1, 'python': 8}.
+         Steps of other jobs unwrap and build cages while one bakes, see dag.StageScheduler. An empty dict
+         uses dag.default_limits(). max_workers then limits the steps running in total, defaulting to the
+         sum of the limits.
+        :return: List of BatchResult, in the same order as jobs.
+        """
+        scheduler = None
+        if resource_limits is not None:
+            scheduler = StageScheduler(resource_limits, max_running=max_workers)
+            max_workers = scheduler.max_running
+        max_workers = max_workers or os.cpu_count()
+        logging.info(f'START BATCH OF {len(jobs)} JOBS WITH {max_workers} WORKERS')
+        results = [None] * len(jobs)
+        planned = list(enumerate(jobs))
+        if preflight:
+            planned, rejected = plan_batch(jobs, max_triangles, adjust_job)
+            for index, result in rejected.items():
+                logging.info(f'REJECTED JOB {result.name}: {result.error}')
+                results[index] = result
+        journal = BatchJournal(journal_path) if journal_path is not None else None
+        try:
+            if scheduler is not None:
+                planned_results = scheduler.run(self, [job for _, job in planned], journal)
+                for (index, _), result in zip(planned, planned_results):
+                    results[index] = result
+            else:
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    planned_results = executor.map(lambda plan: run_job(self, plan[1], journal), planned)
+                    for (index, _), result in zip(planned, planned_results):
+                        results[index] = result
+        finally:
+            if journal is not None:
+                journal.close()
+        failed = [result.name for result in results if not result.ok]
+        logging.info(f'BATCH OK, {len(failed)} FAILED: {failed}')
+        return results
+
+    def _execute(self, stage: Stage):
+        if stage.skip_message is not None:
+            logging.info(stage.skip_message)
+            return
+        logging.info(f'START {stage.name}')
+        start = time.perf_counter()
+        process = self._run_stage(stage)
+        self._record_metrics(stage, process, time.perf_counter() - start)
+        if stage.cancel is not None and stage.cancel.is_set():
+            logging.info(f'{stage.name} CANCELLED')
+            return
+        if process.killed_reason is not None:
+            raise StageTimeoutError(f'{stage.name} {process.killed_reason}')
+        self._raise_for_returncode(stage, process)
+        logging.info(f'{stage.name} OK')
+
+    def _execute_parallel(self, stages: list, then: Stage=None, max_parallel: int=None,
+                          encoder: TileEncoder=None):
+        """
+        Execute up to max_parallel of stages at the same time, all of them if None, then the stage then.
+        :param encoder: Encodes the textures the stages write tiles for, while they run.
+         Waited for before then, which may use the textures.
+        """
+        if encoder is not None:
+            encoder.start()
+        try:
+            with ThreadPoolExecutor(max_workers=max_parallel or len(stages)) as executor:
+                list(executor.map(self._execute, stages))
+        finally:
+            if encoder is not None:
+                encoder.stop()
+        if encoder is not None:
+            encoder.wait()
+        if then is not None:
+            self._execute(then)
+
+    def _run_stage(self, stage: Stage) -> ProcessResult:
+        """Run a stage script, or restore its outputs from the cache when it ran before with the same
+         inputs and arguments."""
+        if self.cache is None:
+            return self._run_retrying(stage)
+        key = self.cache.key(stage.python_filename, stage.input_paths, stage.args)
+        if self.cache.restore(key, stage.output_paths):
+            logging.info(f'CACHE HIT FOR {stage.python_filename}: {stage.output_paths[0]}')
+            return ProcessResult(stage.args, 0, cached=True)
+        process = self._run_retrying(stage)
+        if process.returncode == 0:
+            self.cache.store(key, stage.output_paths)
+        return process
+
+    def _run_retrying(self, stage: Stage) -> ProcessResult:
+        """Run a stage script, again after a backoff while its watchdog killed it and retries are left."""
+        process = self._run_admitted(stage)
+        for retry in range(self.retries):
+            if process.killed_reason is None:
+                break
+            backoff = self.retry_backoff * 2**retry
+            logging.info(f'{stage.name} {process.killed_reason}, RETRYING IN {backoff}s')
+            time.sleep(backoff)
+            process = self._run_admitted(stage)
+        return process
+
+    def _watchdog(self, stage: Stage) -> Watchdog:
+        return Watchdog(self.timeouts.get(Path(stage.python_filename).stem), self.heartbeat_timeout)
+
+    def _event_callback(self, stage: Stage):
+        if self.progress_callback is None:
+            return None
+        return lambda event: self.progress_callback(dict(event, name=stage.name))
+
+    def _run_admitted(self, stage: Stage) -> ProcessResult:
+        """Run a stage script once the scheduler admits it, then correct its estimates with the measured memory."""
+        if self.scheduler is None:
+            return self._run_process(stage.python_filename, *stage.args, cancel=stage.cancel,
+                                     watchdog=self._watchdog(stage), on_event=self._event_callback(stage))
+        base_estimate = self.scheduler.base_estimate(stage.input_paths, stage.texture_pixels)
+        estimate = self.scheduler.estimate(stage.python_filename, base_estimate)
+        self.scheduler.acquire(estimate)
+        try:
+            process = self._run_process(stage.python_filename, *stage.args, cancel=stage.cancel,
+                                        watchdog=self._watchdog(stage), on_event=self._event_callback(stage))
+        finally:
+            self.scheduler.release(estimate)
+        self.scheduler.learn(stage.python_filename, base_estimate, peak_rss(process))
         return process
 
+    def _record_metrics(self, stage: Stage, process: ProcessResult, wall_seconds: float):
+        if self.metrics is not None:
+            asset = stage.output_paths[0] if stage.output_paths else None
+            self.metrics.record(stage_metrics(stage.name, asset, process, wall_seconds))
+
+    def _raise_for_returncode(self, stage: Stage, process: ProcessResult):
+        if process.returncode in stage.errors:
+            raise stage.errors[process.returncode]
+        if stage.raise_on_failure and process.returncode != 0:
+            raise RuntimeError(failure_message(stage.name, process))
+
+    def _launch_profile(self, python_filename: str) -> LaunchProfile:
+        if self.launch_profiles is None:
+            return USER_PROFILE
+        return self.launch_profiles.get(python_filename, WORKER_PROFILE)
+
+    def _bake_settings(self, width: int, height: int, map_types: str, tile_x: Optional[int],
+                       tile_y: Optional[int], threads: Optional[int]) -> tuple:
+        """(tile_x, tile_y, threads) to bake with, those not given taken from the bake profile or defaults."""
+        settings = None
+        if self.bake_profile is not None and None in (tile_x, tile_y, threads):
+            settings = self.bake_profile.settings(width, height, map_types)
+        settings = settings or _DEFAULT_BAKE_SETTINGS
+        return (settings.tile_x if tile_x is None else tile_x, settings.tile_y if tile_y is None else tile_y,
+                settings.threads if threads is None else threads)
+
+    def step_outputs(self, stage: str, kwargs: dict) -> list:
+        """Files written by calling the stage method with kwargs, such as the steps of a BatchJob."""
+        arguments = inspect.signature(getattr(self, stage)).bind(**kwargs)
+        arguments.apply_defaults()
+        arguments = arguments.arguments
+        outputs = []
+        for name in _WRITTEN_MESHES.get(stage, ()):
+            if arguments[name] is not None:
+                for path in mesh_paths(arguments[name]):
+                    outputs += self._mesh_outputs(path)
+        if stage == 'generate_lod' and arguments['chain']:
+            for path in mesh_paths(arguments['output_path']):
+                outputs += self._lod_outputs(path, arguments['number_of_levels'])
+        if 'map_types' in arguments:
+            extension = _TEXTURE_EXTENSIONS[arguments.get('texture_format', 'PNG')]
+            outputs += self._texture_outputs(arguments['texture_output_path'], arguments['base_texture_name'],
+                                             arguments['map_types'], extension)
+        return outputs
+
+    def _mesh_outputs(self, mesh_path) -> list:
+        """Files written when exporting mesh_path, .obj files get a .mtl alongside."""
+        mesh_path = Path(mesh_path)
+        if mesh_path.suffix == '.obj':
+            return [mesh_path, mesh_path.with_suffix('.mtl')]
+        return [mesh_path]
+
+    def _lod_outputs(self, output_path, number_of_levels: int) -> list:
+        """Files generate_lod(chain=True) writes beside output_path."""
+        outputs = [path for level_path in self.lod_level_paths(output_path, number_of_levels)
+                   for path in self._mesh_outputs(level_path)]
+        return outputs + [Path(output_path).with_name(f'{Path(output_path).stem}_lods.json')]
+
+    def _texture_outputs(self, texture_output_path, base_texture_name, map_types: str, extension='.png') -> list:
+        return [Path(texture_output_path) / f'{base_texture_name}_{map_type.lower()}{extension}'
+                for map_type in map_types.split()]
+
+    def _run_process(self, python_filename: str, *args, cancel: Event=None, watchdog: Watchdog=None,
+                     on_event=None) -> ProcessResult:
+        """
+        :param cancel: Event which kills Blender when set.
+        :param watchdog: Watchdog which kills Blender when it expires.
+        :param on_event: Function called with each event as Blender reports it.
+        """
+        if cancel is not None and cancel.is_set():
+            return ProcessResult([python_filename] + list(args), -1)
+        watchdog = watchdog or Watchdog()
+        if self._pool is not None:
+            return self._pool.run(python_filename, *args, cancel=cancel, watchdog=watchdog, on_event=on_event)
+        profile = self._launch_profile(python_filename)
+        args = blender_command(self.blender_path, python_filename, *args, profile=profile)
+        events = EventsFile(on_event)
+        launch_time = time.time()
+        env = dict(profile.env(self._env), PHOTOGRAMMETRY_EVENTS=str(events.path))
+        process = Popen(args=args, cwd=SCRIPT_DIR, env=env, stdout=PIPE, stderr=PIPE)
+        watchdog.start()
+        output = ProcessOutput(f'{python_filename} {process.pid}')
+        output.drain(process)
+        while True:
+            try:
+                process.wait(POLL_INTERVAL)
+                break
+            except TimeoutExpired:
+                watchdog.events(events.read_new())
+                if (cancel is not None and cancel.is_set()) or watchdog.expired():
+                    process.kill()
+        output.join()
+        return ProcessResult(args, process.returncode, stderr=output.stderr.text(), events=events.close(),
+                             launch_time=launch_time, killed_reason=watchdog.reason)
+
     def _raise_path_not_exists(self, *paths):
         for path in paths:
             path = Path(path)
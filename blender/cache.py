@@ -0,0 +1,89 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import shutil
+from threading import Lock
+
+
+def hash_file(path, chunk_size=1 << 20) -> str:
+    sha = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class StageCache:
+    """
+    Outputs of stages stored in cache_dir under a key made from the stage, the content of its input
+     files and its arguments. Restoring copies the outputs back to where the stage would have written them.
+    Entries are evicted least recently used first once the cache grows beyond max_size bytes.
+    """
+    def __init__(self, cache_dir, max_size: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self._file_hashes = {}
+        self._lock = Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def key(self, python_filename: str, input_paths, args) -> str:
+        sha = hashlib.sha256(python_filename.encode())
+        for path in input_paths:
+            sha.update(self._hash_input(path).encode())
+        sha.update(json.dumps(list(map(str, args))).encode())
+        return sha.hexdigest()
+
+    def restore(self, key: str, output_paths) -> bool:
+        """Copy cached outputs of key to output_paths, returns False if key isn't cached."""
+        entry = self.cache_dir / key
+        if not entry.exists():
+            return False
+        for i, path in enumerate(output_paths):
+            cached = entry / str(i)
+            if cached.exists():
+                path = Path(path)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                partial_path = path.with_name(f'{path.name}.{os.getpid()}.partial')
+                shutil.copyfile(cached, partial_path)
+                os.replace(partial_path, path)
+        os.utime(entry)
+        return True
+
+    def store(self, key: str, output_paths):
+        """Copy output_paths which exist into the cache under key."""
+        entry = self.cache_dir / key
+        partial = self.cache_dir / f'{key}.partial.{os.getpid()}.{id(output_paths)}'
+        partial.mkdir()
+        for i, path in enumerate(output_paths):
+            if Path(path).exists():
+                shutil.copyfile(path, partial / str(i))
+        try:
+            partial.rename(entry)
+        except OSError:
+            # stored by another job in the meantime
+            shutil.rmtree(partial, ignore_errors=True)
+        self._evict()
+
+    def _hash_input(self, path) -> str:
+        stat = os.stat(path)
+        file_id = (str(path), stat.st_size, stat.st_mtime_ns)
+        if file_id not in self._file_hashes:
+            self._file_hashes[file_id] = hash_file(path)
+        return self._file_hashes[file_id]
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for entry in self.cache_dir.iterdir():
+                if entry.is_dir() and '.partial.' not in entry.name:
+                    size = sum(file.stat().st_size for file in entry.iterdir())
+                    entries.append((entry.stat().st_mtime, size, entry))
+            total_size = sum(size for _, size, _ in entries)
+            for _, size, entry in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+                logging.info(f'EVICTING CACHE ENTRY: {entry.name}')
+                shutil.rmtree(entry, ignore_errors=True)
+                total_size -= size
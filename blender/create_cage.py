@@ -1,18 +1,23 @@
 import bpy
-from operators import AutomateMacro, OBJECT_OT_automate_create_cage, WM_OT_exit
-import sys
+from operators import AutomateMacro, OBJECT_OT_automate_create_cage, WM_OT_exit, enable_addons, script_args
+
+
+def define(macro, high_poly_path, low_poly_path, cage_path, inflate_max_iterations=50, inflate_time_budget=60):
+    create_cage = macro.define('OBJECT_OT_automate_create_cage')
+    create_cage.properties.high_poly_path = high_poly_path
+    create_cage.properties.low_poly_path = low_poly_path
+    create_cage.properties.cage_path = cage_path
+    create_cage.properties.inflate_max_iterations = int(inflate_max_iterations)
+    create_cage.properties.inflate_time_budget = float(inflate_time_budget)
+    return create_cage
 
 
 if __name__ == '__main__':
-    high_poly_path, low_poly_path, cage_path = sys.argv[5:]
+    enable_addons()
     bpy.utils.register_class(OBJECT_OT_automate_create_cage)
     bpy.utils.register_class(WM_OT_exit)
     bpy.utils.register_class(AutomateMacro)
 
-    create_cage = AutomateMacro.define('OBJECT_OT_automate_create_cage')
-    create_cage.properties.high_poly_path = high_poly_path
-    create_cage.properties.low_poly_path = low_poly_path
-    create_cage.properties.cage_path = cage_path
+    define(AutomateMacro, *script_args())
     AutomateMacro.define('WM_OT_exit')
     bpy.ops.wm.automation_macro()
-
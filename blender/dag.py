@@ -0,0 +1,195 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import heapq
+import logging
+import os
+from queue import Queue
+import time
+
+from blender.batch import BatchResult, run_step, run_step_async, step_dependencies
+
+
+# stage method: resource class it's limited by
+STAGE_RESOURCES = {
+    # QuadRemesher's engine and UVPackmaster's search run beside Blender, time boxed or not, on a few cores
+    'remesh': 'addon', 'remesh_auto': 'addon', 'pack': 'addon',
+    # single threaded Python in Blender
+    'unwrap': 'python', 'create_cage': 'python', 'generate_lod': 'python',
+    # Cycles uses every core
+    'bake': 'render', 'process_asset': 'render',
+}
+
+
+def default_limits() -> dict:
+    """Steps of each resource class allowed to run at once."""
+    cores = os.cpu_count() or 1
+    return {'python': cores, 'addon': max(1, cores // 4), 'render': 1}
+
+
+class StageScheduler:
+    """
+    Runs the steps of batch jobs as a graph instead of each job's steps in turn. A step waits for the
+     earlier steps of its job it depends on, see batch.step_dependencies, and for a free slot of its resource
+     class. Ready steps of earlier jobs go first, so while one asset bakes the next ones unwrap and build
+     cages, and a bake slot never waits on a job which hasn't started.
+    A step raising stops its job, steps of the job already running finish.
+    """
+    def __init__(self, limits: dict=None, resources: dict=None, max_running: int=None):
+        """
+        :param limits: Steps of each resource class allowed to run at once, merged into default_limits().
+        :param resources: Stage method: resource class, merged into STAGE_RESOURCES. Stages in neither run
+         as 'render'.
+        :param max_running: Steps allowed to run at once in total, defaults to the sum of the limits.
+        """
+        self.limits = dict(default_limits(), **(limits or {}))
+        self.resources = dict(STAGE_RESOURCES, **(resources or {}))
+        self.max_running = max_running or sum(self.limits.values())
+
+    def resource(self, stage: str) -> str:
+        return self.resources.get(stage, 'render')
+
+    def run(self, blender, jobs: list, journal=None) -> list:
+        """
+        Run the steps of jobs on blender with threads.
+        :param journal: BatchJournal to record the steps in, a finished step is skipped while every step
+         it depends on was skipped as well.
+        :return: List of BatchResult, in the same order as jobs.
+        """
+        graph = _JobGraph(blender, jobs)
+        ready = {resource: [] for resource in self.limits}
+        running = dict.fromkeys(self.limits, 0)
+        finished = Queue()
+
+        def push_ready(job_index: int, step: int):
+            stage = jobs[job_index].steps[step][0]
+            heapq.heappush(ready.setdefault(self.resource(stage), []), (job_index, step))
+
+        def run(job_index: int, step: int):
+            try:
+                resumed = run_step(blender, jobs[job_index], step, journal, graph.resumable(job_index, step))
+                finished.put((job_index, step, resumed, None))
+            except Exception as e:
+                finished.put((job_index, step, False, e))
+
+        for job_index, step in graph.initial_steps():
+            push_ready(job_index, step)
+        with ThreadPoolExecutor(max_workers=self.max_running) as executor:
+            total_running = 0
+            while True:
+                for resource, heap in ready.items():
+                    while heap and running.get(resource, 0) < self.limits.get(resource, 1) and \
+                            total_running < self.max_running:
+                        job_index, step = heapq.heappop(heap)
+                        if graph.errors[job_index] is not None:
+                            continue
+                        graph.start(job_index)
+                        running[resource] = running.get(resource, 0) + 1
+                        total_running += 1
+                        executor.submit(run, job_index, step)
+                if total_running == 0:
+                    break
+                job_index, step, resumed, error = finished.get()
+                running[self.resource(jobs[job_index].steps[step][0])] -= 1
+                total_running -= 1
+                for job_index, step in graph.finish(job_index, step, resumed, error):
+                    push_ready(job_index, step)
+        return graph.results()
+
+    async def run_async(self, blender, jobs: list, journal=None) -> list:
+        """run for blenders whose stage methods return coroutines, every step is a task."""
+        graph = _JobGraph(blender, jobs)
+        semaphores = {resource: asyncio.Semaphore(limit) for resource, limit in self.limits.items()}
+        total = asyncio.Semaphore(self.max_running)
+        done = {}
+
+        async def run(job_index: int, step: int):
+            dependencies = [done[job_index, dependency] for dependency in graph.dependencies[job_index][step]]
+            if dependencies:
+                await asyncio.wait(dependencies)
+            if graph.errors[job_index] is not None:
+                return
+            resource = self.resource(jobs[job_index].steps[step][0])
+            semaphore = semaphores.setdefault(resource, asyncio.Semaphore(1))
+            async with semaphore, total:
+                if graph.errors[job_index] is not None:
+                    return
+                graph.start(job_index)
+                try:
+                    resumed = await run_step_async(blender, jobs[job_index], step, journal,
+                                                   graph.resumable(job_index, step))
+                    graph.finish(job_index, step, resumed, None)
+                except Exception as e:
+                    graph.finish(job_index, step, False, e)
+
+        # created in job order, so steps of earlier jobs are first to wait on each semaphore
+        for job_index, job in enumerate(jobs):
+            for step in range(len(job.steps)):
+                done[job_index, step] = asyncio.ensure_future(run(job_index, step))
+        await asyncio.gather(*done.values())
+        return graph.results()
+
+
+class _JobGraph:
+    """Progress of the steps of each job, and which steps become ready as others finish."""
+    def __init__(self, blender, jobs: list):
+        self.jobs = jobs
+        self.errors = [None] * len(jobs)
+        self.dependencies = []
+        for job_index, job in enumerate(jobs):
+            try:
+                self.dependencies.append(step_dependencies(blender, job))
+            except Exception as e:
+                # such as a step whose kwargs don't fit its stage method, it fails the job alone
+                self.errors[job_index] = e
+                self.dependencies.append([set() for _ in job.steps])
+                logging.info(f'JOB {job.name} FAILED: {e}')
+        self.dependents = [[[later for later in range(len(job.steps)) if step in dependencies[later]]
+                            for step in range(len(job.steps))] for job, dependencies in zip(jobs, self.dependencies)]
+        self.waiting = [[len(step_dependencies) for step_dependencies in dependencies]
+                        for dependencies in self.dependencies]
+        self.completed = [[] for _ in jobs]
+        self.resumed = [set() for _ in jobs]
+        self.start_times = [None] * len(jobs)
+        self.end_times = [None] * len(jobs)
+
+    def initial_steps(self) -> list:
+        return [(job_index, step) for job_index, waiting in enumerate(self.waiting)
+                if self.errors[job_index] is None for step, count in enumerate(waiting) if count == 0]
+
+    def resumable(self, job_index: int, step: int) -> bool:
+        return self.dependencies[job_index][step] <= self.resumed[job_index]
+
+    def start(self, job_index: int):
+        if self.start_times[job_index] is None:
+            self.start_times[job_index] = time.perf_counter()
+
+    def finish(self, job_index: int, step: int, resumed: bool, error) -> list:
+        """Record that step of job finished, returns the steps which became ready."""
+        self.end_times[job_index] = time.perf_counter()
+        stage = self.jobs[job_index].steps[step][0]
+        if error is not None:
+            if self.errors[job_index] is None:
+                self.errors[job_index] = error
+                logging.info(f'JOB {self.jobs[job_index].name} FAILED AT {stage}: {error}')
+            return []
+        self.completed[job_index].append(step)
+        if resumed:
+            self.resumed[job_index].add(step)
+        ready = []
+        for later in self.dependents[job_index][step]:
+            self.waiting[job_index][later] -= 1
+            if self.waiting[job_index][later] == 0:
+                ready.append((job_index, later))
+        return ready
+
+    def results(self) -> list:
+        results = []
+        for job_index, job in enumerate(self.jobs):
+            stages = [step for step, _ in job.steps]
+            elapsed = 0. if self.start_times[job_index] is None else \
+                self.end_times[job_index] - self.start_times[job_index]
+            results.append(BatchResult(job.name, [stages[step] for step in self.completed[job_index]],
+                                       self.errors[job_index], elapsed,
+                                       [stages[step] for step in self.completed[job_index]
+                                        if step in self.resumed[job_index]]))
+        return results
@@ -1,19 +1,26 @@
 import bpy
-from operators import AutomateMacro, OBJECT_OT_generate_lod, WM_OT_exit
-import sys
+from operators import AutomateMacro, OBJECT_OT_generate_lod, WM_OT_exit, enable_addons, script_args
+
+
+def define(macro, low_poly_path, output_path, number_of_levels, level_ratio, chain='False', *paths):
+    """Generate LODs of low_poly_path, then of each further (low poly path, output path) pair in paths."""
+    for low_poly_path, output_path in zip((low_poly_path,) + paths[::2], (output_path,) + paths[1::2]):
+        generate_lod = macro.define('OBJECT_OT_generate_lod')
+        generate_lod.properties.low_poly_path = low_poly_path
+        generate_lod.properties.output_path = output_path
+        generate_lod.properties.number_of_levels = int(number_of_levels)
+        generate_lod.properties.level_ratio = float(level_ratio)
+        generate_lod.properties.chain = chain == 'True'
+        generate_lod.properties.unload = bool(paths)
+    return generate_lod
 
 
 if __name__ == '__main__':
-    low_poly_path, output_path, number_of_levels, level_ratio = sys.argv[5:]
+    enable_addons()
     bpy.utils.register_class(OBJECT_OT_generate_lod)
     bpy.utils.register_class(WM_OT_exit)
     bpy.utils.register_class(AutomateMacro)
 
-    generate_lod = AutomateMacro.define('OBJECT_OT_generate_lod')
-    generate_lod.properties.low_poly_path = low_poly_path
-    generate_lod.properties.output_path = output_path
-    generate_lod.properties.number_of_levels = int(number_of_levels)
-    generate_lod.properties.level_ratio = float(level_ratio)
-
+    define(AutomateMacro, *script_args())
     AutomateMacro.define('WM_OT_exit')
     bpy.ops.wm.automation_macro()
@@ -0,0 +1,95 @@
+import json
+import os
+from pathlib import Path
+import sqlite3
+from threading import Lock
+import time
+
+from blender.cache import hash_file
+
+
+class BatchJournal:
+    """
+    SQLite record of the steps of batch jobs, with their status, timings and the checksums of the files
+     they wrote. A batch run again with the same journal skips the steps which finished, as long as their
+     parameters are the same and their outputs are still the files they wrote.
+    A step which was running when the batch died, or failed, is run again. Outputs are moved into place
+     once fully written, see operators.export_selected, so a step cut short leaves no partial outputs.
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = Lock()
+        # autocommit, every update is written as soon as it's made
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('''
+            CREATE TABLE IF NOT EXISTS steps (
+                job TEXT, step INTEGER, stage TEXT, params TEXT, status TEXT, started REAL, finished REAL,
+                outputs TEXT, error TEXT, PRIMARY KEY (job, step))''')
+
+    def close(self):
+        self._connection.close()
+
+    def is_finished(self, job: str, step: int, stage: str, kwargs: dict) -> bool:
+        """Whether step of job finished with the same stage and kwargs, and its outputs are unchanged."""
+        with self._lock:
+            row = self._connection.execute('SELECT stage, params, status, outputs FROM steps WHERE job=? AND step=?',
+                                           (job, step)).fetchone()
+        if row is None or row[:3] != (stage, _params(kwargs), 'finished'):
+            return False
+        for path, record in json.loads(row[3]).items():
+            current = _file_record(path, record)
+            if current is None or current[2] != record[2]:
+                return False
+        return True
+
+    def start(self, job: str, step: int, stage: str, kwargs: dict):
+        with self._lock:
+            self._connection.execute('INSERT OR REPLACE INTO steps VALUES (?, ?, ?, ?, ?, ?, NULL, NULL, NULL)',
+                                     (job, step, stage, _params(kwargs), 'running', time.time()))
+
+    def finish(self, job: str, step: int, output_paths):
+        """
+        Record that step of job finished, with the size, modification time and checksum of its outputs.
+        The step is recorded as failed if any of its outputs is missing, so it runs again.
+        """
+        outputs = {str(path): _file_record(path) for path in output_paths}
+        missing = [path for path, record in outputs.items() if record is None]
+        status = 'failed' if missing else 'finished'
+        error = f"FileNotFoundError: missing outputs {', '.join(missing)}" if missing else None
+        with self._lock:
+            self._connection.execute(
+                'UPDATE steps SET status=?, finished=?, outputs=?, error=? WHERE job=? AND step=?',
+                (status, time.time(), json.dumps(outputs), error, job, step))
+
+    def fail(self, job: str, step: int, error: Exception):
+        with self._lock:
+            self._connection.execute('UPDATE steps SET status=?, finished=?, error=? WHERE job=? AND step=?',
+                                     ('failed', time.time(), f'{type(error).__name__}: {error}', job, step))
+
+    def steps(self, job: str=None) -> list:
+        """Rows of the journal as dicts, of every job or just job, in order."""
+        query = 'SELECT * FROM steps' + (' WHERE job=?' if job is not None else '') + ' ORDER BY job, step'
+        with self._lock:
+            cursor = self._connection.execute(query, (job,) if job is not None else ())
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _params(kwargs: dict) -> str:
+    return json.dumps(kwargs, sort_keys=True, default=str)
+
+
+def _file_record(path, record: list=None) -> list:
+    """
+    [size, modification time, sha256] of path, None if it doesn't exist. When the size and modification
+     time match record, its checksum is taken from record instead of hashing the file again.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if record is not None and record[:2] == [stat.st_size, stat.st_mtime_ns]:
+        return record
+    return [stat.st_size, stat.st_mtime_ns, hash_file(path)]
@@ -0,0 +1,282 @@
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+import sys
+import tempfile
+from threading import Lock, Thread
+import time
+from typing import NamedTuple, Optional
+
+
+SCRIPT_DIR = Path(__file__).parent
+# seconds between checks on a running stage, whether it was cancelled or its watchdog expired
+POLL_INTERVAL = .1
+# bytes of a Blender's output kept for the error raised when its stage fails
+_OUTPUT_TAIL = 2**16
+_READ_SIZE = 2**16
+# seconds to wait for the rest of a Blender's output after it exited, its add-ons' processes may hold the pipes
+_DRAIN_TIMEOUT = 1
+
+
+class ProcessResult(NamedTuple):
+    """
+    :param args: Command line or arguments of the stage.
+    :param returncode: Exit code of the stage script.
+    :param stderr: Error output of Blender, when captured.
+    :param events: Events reported by the operators, see operators.emit.
+    :param launch_time: time.time() when the stage was started.
+    :param cached: The stage's outputs were restored from the cache without running Blender.
+    :param killed_reason: Why the stage's Watchdog killed Blender, None if it wasn't killed.
+    """
+    args: list
+    returncode: int
+    stderr: Optional[str] = None
+    events: list = []
+    launch_time: Optional[float] = None
+    cached: bool = False
+    killed_reason: Optional[str] = None
+
+
+def failure_message(stage_name: str, process: ProcessResult) -> str:
+    """Why a stage failed, from the error events its operators reported and the end of Blender's stderr."""
+    errors = [event['message'] for event in process.events if event['event'] == 'error']
+    if process.stderr:
+        errors.append(process.stderr.rstrip())
+    return '\n'.join([f'{stage_name} exited with code {process.returncode}'] + errors)
+
+
+class LaunchProfile(NamedTuple):
+    """
+    How Blender is started for a stage script.
+    :param background: Run without a window (--background). Stages whose add-ons report back through modal
+     operators, QuadRemesher and UVPackmaster, need a window's event loop.
+    :param factory_startup: Skip the user's preferences and startup file (--factory-startup), so only the
+     add-ons in addons are loaded. This also resets Cycles' compute device to the CPU, so the baking
+     scripts keep the user's preferences.
+    :param addons: Add-ons the stage needs, by module name or the start of it, see operators.enable_addons.
+    """
+    background: bool = True
+    factory_startup: bool = True
+    addons: tuple = ()
+
+    def env(self, env: dict) -> dict:
+        return dict(env, PHOTOGRAMMETRY_ADDONS=','.join(self.addons))
+
+
+_QUADREMESHER = 'quad_remesher'
+_UVPACKMASTER = 'uvpackmaster2'
+_AUTO_SEAMS = 'uv_auto_seam_unwrap'
+# stage script: how it's started, scripts not in it are started like the ones which need every add-on
+LAUNCH_PROFILES = {
+    'remesh.py': LaunchProfile(background=False, addons=(_QUADREMESHER,)),
+    'unwrap.py': LaunchProfile(addons=(_AUTO_SEAMS,)),
+    'pack.py': LaunchProfile(background=False, addons=(_UVPACKMASTER,)),
+    'create_cage.py': LaunchProfile(),
+    'bake.py': LaunchProfile(factory_startup=False),
+    'bake_material.py': LaunchProfile(),
+    'generate_lod.py': LaunchProfile(),
+    'process_asset.py': LaunchProfile(background=False, factory_startup=False,
+                                      addons=(_QUADREMESHER, _UVPACKMASTER, _AUTO_SEAMS)),
+}
+# worker processes run any stage, bakes included, so they keep the user's preferences like bake.py. They enable
+#  whichever of the add-ons are installed, a stage needing a missing one fails on its own
+WORKER_PROFILE = LaunchProfile(background=False, factory_startup=False,
+                               addons=(_QUADREMESHER, _UVPACKMASTER, _AUTO_SEAMS))
+# Blender as it was started before launch profiles, with a window and every add-on the user enabled
+USER_PROFILE = LaunchProfile(background=False, factory_startup=False)
+
+
+def blender_command(blender_executable: str, python_filename: str, *args, profile: LaunchProfile=USER_PROFILE) -> list:
+    """Command line which runs one of the python scripts in this folder inside Blender,
+     everything after '--' is passed on to the script."""
+    py_program_filepath = SCRIPT_DIR / python_filename
+    flags = ['--disable-abort-handler']
+    if profile.background:
+        flags.append('--background')
+    if profile.factory_startup:
+        flags.append('--factory-startup')
+    # an exception in the script exits instead of leaving Blender open
+    flags += ['--python-exit-code', '1']
+    args = [blender_executable] + flags + ['--python', py_program_filepath, '--'] + list(args)
+    return list(map(str, args))
+
+
+def blender_executable(blender_path: str) -> str:
+    """
+    The Blender executable in the folder blender_path, for this platform, or blender_path itself if it's
+     the executable.
+    """
+    path = Path(blender_path)
+    if path.is_file():
+        return str(path)
+    if sys.platform == 'win32':
+        names = ['blender.exe']
+    elif sys.platform == 'darwin':
+        # blender_path may be Blender.app or the folder holding it
+        names = ['Contents/MacOS/Blender', 'Blender.app/Contents/MacOS/Blender', 'blender']
+    else:
+        names = ['blender']
+    for name in names:
+        if (path / name).is_file():
+            return str(path / name)
+    return str(path / names[0])
+
+
+class OutputLog:
+    """
+    Output of a Blender process, logged a line at a time at debug level as it's read. Its last
+     max_bytes are kept for the error raised when the stage fails.
+    """
+    def __init__(self, name: str, max_bytes=_OUTPUT_TAIL):
+        self.name = name
+        self.max_bytes = max_bytes
+        self._line = b''
+        self._tail = bytearray()
+        self._lock = Lock()
+
+    def write(self, data: bytes):
+        lines = (self._line + data).split(b'\n')
+        self._line = lines.pop()[-self.max_bytes:]
+        for line in lines:
+            logging.debug(f'{self.name}: {line.decode(errors="replace").rstrip()}')
+        with self._lock:
+            self._tail += data
+            del self._tail[:max(len(self._tail) - self.max_bytes, 0)]
+
+    def clear(self):
+        with self._lock:
+            self._tail.clear()
+
+    def text(self) -> str:
+        with self._lock:
+            tail = bytes(self._tail)
+        if len(tail) == self.max_bytes:
+            # starts part way through a line
+            tail = tail[tail.find(b'\n') + 1:]
+        return tail.decode(errors='replace')
+
+
+class ProcessOutput:
+    """
+    stdout and stderr of a Blender process started with both piped, read as they're written so Blender
+     never blocks on a full pipe however much it prints.
+    """
+    def __init__(self, name: str):
+        self.stdout = OutputLog(name)
+        self.stderr = OutputLog(f'{name} stderr')
+        self._threads = []
+        self._tasks = []
+
+    def drain(self, process):
+        """Read the pipes of a subprocess.Popen on threads of their own."""
+        for pipe, output in ((process.stdout, self.stdout), (process.stderr, self.stderr)):
+            thread = Thread(target=_drain_pipe, args=(pipe, output), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def join(self):
+        for thread in self._threads:
+            thread.join(_DRAIN_TIMEOUT)
+
+    def drain_async(self, process):
+        """Read the pipes of an asyncio.subprocess.Process on tasks of their own."""
+        self._tasks = [asyncio.ensure_future(_drain_stream(stream, output))
+                       for stream, output in ((process.stdout, self.stdout), (process.stderr, self.stderr))]
+
+    async def join_async(self):
+        await asyncio.wait(self._tasks, timeout=_DRAIN_TIMEOUT)
+        for task in self._tasks:
+            task.cancel()
+
+
+def _drain_pipe(pipe, output: OutputLog):
+    with pipe:
+        for data in iter(lambda: os.read(pipe.fileno(), _READ_SIZE), b''):
+            output.write(data)
+
+
+async def _drain_stream(stream, output: OutputLog):
+    while True:
+        data = await stream.read(_READ_SIZE)
+        if not data:
+            return
+        output.write(data)
+
+
+class EventsFile:
+    """
+    Empty file for a Blender process to append its events to, given as PHOTOGRAMMETRY_EVENTS, read as
+     lines are appended while Blender runs.
+    """
+    def __init__(self, callback=None):
+        """:param callback: Function called with each event as it's read."""
+        fd, path = tempfile.mkstemp(prefix='blender_events_', suffix='.jsonl')
+        os.close(fd)
+        self.path = Path(path)
+        self.callback = callback
+        self.events = []
+        self._offset = 0
+
+    def read_new(self) -> list:
+        """Events appended since the last read, a partially written last line is left for the next one."""
+        with open(self.path, 'rb') as events_file:
+            events_file.seek(self._offset)
+            data = events_file.read()
+        data = data[:data.rfind(b'\n') + 1]
+        self._offset += len(data)
+        new_events = []
+        for line in data.splitlines():
+            try:
+                new_events.append(json.loads(line))
+            except ValueError:
+                pass
+        self.events += new_events
+        if self.callback is not None:
+            for event in new_events:
+                self.callback(event)
+        return new_events
+
+    def close(self) -> list:
+        """All the events written, the file is removed."""
+        self.read_new()
+        self.path.unlink()
+        return self.events
+
+
+class Watchdog:
+    """
+    Decides when a stage's Blender is stuck: it ran longer than timeout seconds, or a modal operator's
+     heartbeats stopped for heartbeat_timeout seconds, see operators.start_heartbeat.
+    Heartbeats are only expected while the last event was one, operators which block Blender don't send them.
+    The clock starts with start, once Blender runs the stage, so time spent waiting for a worker or a free
+     slot doesn't count against timeout.
+    """
+    def __init__(self, timeout: float=None, heartbeat_timeout: float=None):
+        self.timeout = timeout
+        self.heartbeat_timeout = heartbeat_timeout
+        self.reason = None
+        self._start = None
+        self._last_event = None
+        self._last_event_time = None
+
+    def start(self):
+        self._start = self._last_event_time = time.monotonic()
+
+    def events(self, events: list):
+        """Record events received from Blender."""
+        if events:
+            self._last_event = events[-1]
+            self._last_event_time = time.monotonic()
+
+    def expired(self) -> bool:
+        if self._start is None:
+            return False
+        now = time.monotonic()
+        if self.timeout is not None and now - self._start > self.timeout:
+            self.reason = f'ran longer than its timeout of {self.timeout}s'
+        elif self.heartbeat_timeout is not None and self._last_event is not None and \
+                self._last_event['event'] == 'heartbeat' and now - self._last_event_time > self.heartbeat_timeout:
+            self.reason = f'sent no heartbeat for {self.heartbeat_timeout}s'
+        return self.reason is not None
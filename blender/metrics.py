@@ -0,0 +1,54 @@
+import json
+from threading import Lock
+from typing import Optional
+
+from blender.launch import ProcessResult
+
+
+def stage_metrics(stage_name: str, asset, process: ProcessResult, wall_seconds: float) -> dict:
+    """
+    Summary of one stage run from the events its operators reported.
+    :return: dict with the stage name, asset path, return code, wall_seconds, startup_seconds (launch until
+     the first operator started), timings of each operator step as 'operator/step': seconds, peak_rss in
+     bytes (None when not measured, for pooled jobs off Linux), input_triangles of the first operator,
+     output_triangles of the last and whether the outputs were cached.
+    """
+    metrics = {'stage': stage_name, 'asset': str(asset), 'returncode': process.returncode,
+               'wall_seconds': wall_seconds, 'startup_seconds': None, 'timings': {}, 'peak_rss': None,
+               'input_triangles': None, 'output_triangles': None, 'cached': process.cached}
+    timings = metrics['timings']
+    for event in process.events:
+        if event['event'] == 'started' and metrics['startup_seconds'] is None and process.launch_time is not None:
+            metrics['startup_seconds'] = event['time'] - process.launch_time
+        elif event['event'] == 'timing':
+            step = f"{event['stage']}/{event['step']}"
+            timings[step] = timings.get(step, 0) + event['seconds']
+        elif event['event'] == 'stage':
+            if event['peak_rss'] is not None:
+                metrics['peak_rss'] = max(metrics['peak_rss'] or 0, event['peak_rss'])
+            if metrics['input_triangles'] is None:
+                metrics['input_triangles'] = event['input_triangles']
+            metrics['output_triangles'] = event['output_triangles']
+    return metrics
+
+
+def peak_rss(process: ProcessResult) -> Optional[int]:
+    """Largest peak resident memory the operators of a stage run reported, None if they reported none."""
+    peaks = [event['peak_rss'] for event in process.events
+             if event['event'] == 'stage' and event['peak_rss'] is not None]
+    return max(peaks) if peaks else None
+
+
+class MetricsRecorder:
+    """Appends stage metrics as JSON lines to path, and/or passes them to callback."""
+    def __init__(self, path=None, callback=None):
+        self.path = path
+        self.callback = callback
+        self._lock = Lock()
+
+    def record(self, metrics: dict):
+        if self.path is not None:
+            with self._lock, open(self.path, 'a') as metrics_file:
+                metrics_file.write(json.dumps(metrics) + '\n')
+        if self.callback is not None:
+            self.callback(metrics)
@@ -0,0 +1,133 @@
+import hashlib
+import mmap
+import os
+import re
+from typing import NamedTuple, Optional
+
+
+_CHUNK_SIZE = 2**24
+_VERTEX = re.compile(rb'^v[ \t]+(\S+)[ \t]+(\S+)[ \t]+(\S+)', re.M)
+_FACE = re.compile(rb'^f[ \t][^\n]*', re.M)
+# whitespace before a face corner, so the number of matches is the number of corners
+_CORNER = re.compile(rb'[ \t]+(?=[^ \t\r\n])')
+# rough bytes Blender uses per vertex, face corner and face of an imported mesh
+_VERTEX_MEMORY = 40
+_CORNER_MEMORY = 32
+_FACE_MEMORY = 24
+
+
+class InvalidMeshError(Exception): pass
+
+
+class ObjStats(NamedTuple):
+    """
+    :param path: Path of the .obj.
+    :param file_size: Size of the .obj in bytes.
+    :param vertices: Number of v lines.
+    :param uvs: Number of vt lines.
+    :param normals: Number of vn lines.
+    :param faces: Number of f lines.
+    :param triangles: Number of triangles the faces make.
+    :param objects: Number of o and g lines.
+    :param bounds_min: (x, y, z) minimum corner of the vertices' bounding box, None if it wasn't scanned.
+    :param bounds_max: (x, y, z) maximum corner of the vertices' bounding box.
+    :param sha256: Hex digest of the file, the same as blender.cache.hash_file's.
+    :param problems: Reasons the .obj can't be processed, empty if it looks fine.
+    """
+    path: str
+    file_size: int
+    vertices: int
+    uvs: int
+    normals: int
+    faces: int
+    triangles: int
+    objects: int
+    bounds_min: Optional[tuple]
+    bounds_max: Optional[tuple]
+    sha256: str
+    problems: list
+
+    @property
+    def estimated_memory(self) -> int:
+        """Rough bytes Blender needs to hold the mesh once imported."""
+        corners = self.triangles + 2 * self.faces
+        return self.vertices * _VERTEX_MEMORY + corners * _CORNER_MEMORY + self.faces * _FACE_MEMORY
+
+
+def scan_obj(path, bounds=True) -> ObjStats:
+    """
+    Count the elements of the .obj at path, reading it through a memory map a chunk at a time
+     without building arrays of its vertices or faces.
+    :param bounds: Parse the vertex coordinates for the bounding box, the slowest part of the scan.
+    """
+    counts = dict.fromkeys((b'v', b'vt', b'vn', b'f', b'o', b'g'), 0)
+    triangles = 0
+    problems = []
+    bounds_min = [float('inf')] * 3
+    bounds_max = [float('-inf')] * 3
+    sha = hashlib.sha256()
+    last_line = b''
+    file_size = os.path.getsize(path)
+    if file_size > 0:
+        with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = 0
+            while start < file_size:
+                end = min(start + _CHUNK_SIZE, file_size)
+                if end < file_size:
+                    # chunks end with a whole line
+                    newline = data.find(b'\n', end - 1)
+                    end = file_size if newline < 0 else newline + 1
+                chunk = data[start:end]
+                sha.update(chunk)
+                for keyword in counts:
+                    # a space or a tab after the keyword, like _VERTEX and _FACE
+                    for separator in (b' ', b'\t'):
+                        counts[keyword] += chunk.count(b'\n' + keyword + separator) + \
+                            chunk.startswith(keyword + separator)
+                face_lines = _FACE.findall(chunk)
+                triangles += _corner_count(b'\n'.join(face_lines)) - 2 * len(face_lines)
+                if bounds:
+                    try:
+                        for axis, values in enumerate(zip(*_VERTEX.findall(chunk))):
+                            values = list(map(float, values))
+                            bounds_min[axis] = min(bounds_min[axis], min(values))
+                            bounds_max[axis] = max(bounds_max[axis], max(values))
+                    except ValueError:
+                        problems.append(f'has a vertex coordinate which isn\'t a number after byte {start}')
+                        bounds = False
+                last_line = chunk.rstrip().rsplit(b'\n', 1)[-1]
+                start = end
+
+    vertices = counts[b'v']
+    has_bounds = bounds and vertices > 0
+    return ObjStats(str(path), file_size, vertices, counts[b'vt'], counts[b'vn'], counts[b'f'], triangles,
+                    counts[b'o'] + counts[b'g'], tuple(bounds_min) if has_bounds else None,
+                    tuple(bounds_max) if has_bounds else None, sha.hexdigest(),
+                    problems + _problems(counts[b'f'], vertices, last_line))
+
+
+def _corner_count(face_lines: bytes) -> int:
+    if any(separator in face_lines for separator in (b'  ', b'\t', b' \n', b' \r')) or face_lines.endswith(b' '):
+        return _CORNER.subn(b'', face_lines)[1]
+    # single spaces between corners, as written by most exporters
+    return face_lines.count(b' ')
+
+
+def _problems(faces: int, vertices: int, last_line: bytes) -> list:
+    problems = []
+    if faces == 0:
+        problems.append('has no faces')
+    tokens = last_line.split()
+    if tokens and tokens[0] in (b'v', b'vt', b'vn', b'f'):
+        # a file cut off mid way usually ends with part of a line
+        min_tokens = {b'v': 4, b'vt': 3, b'vn': 4, b'f': 4}[tokens[0]]
+        if len(tokens) < min_tokens:
+            problems.append(f'is truncated, its last line is incomplete: {last_line.decode(errors="replace")}')
+        elif tokens[0] == b'f':
+            try:
+                indices = [int(corner.split(b'/')[0]) for corner in tokens[1:]]
+            except ValueError:
+                indices = [vertices + 1]
+            if max(indices) > vertices:
+                problems.append(f'is truncated, its last face uses vertex {max(indices)} of {vertices}')
+    return problems
@@ -1,12 +1,223 @@
 import bmesh
 import bpy
 from bpy.types import Operator
-from bpy.props import BoolProperty, CollectionProperty, IntProperty, FloatProperty, StringProperty
+from bpy.props import BoolProperty, CollectionProperty, IntProperty, IntVectorProperty, FloatProperty, StringProperty
+from contextlib import contextmanager
+import hashlib
+import json
+import math
 from mathutils import bvhtree, Vector
+import numpy as np
 import os
 from pathlib import Path
 import sys
-from uvpackmaster2.operator import UVP2_OT_PackOperatorGeneric
+import time
+
+
+# .obj files smaller than this parse quickly enough that caching them isn't worth the write
+_MESH_CACHE_MIN_SIZE = 2**20
+
+
+# texture_format: (file format, extension, color depth, float buffer). PNG, the default, is saved with
+#  image.save() as baked, the others with the scene's image settings
+TEXTURE_FORMATS = {
+    'PNG': ('PNG', '.png', '8', False),
+    'PNG16': ('PNG', '.png', '16', True),
+    'EXR_HALF': ('OPEN_EXR', '.exr', '16', True),
+    'EXR': ('OPEN_EXR', '.exr', '32', True),
+    'TIFF': ('TIFF', '.tif', '8', False),
+}
+
+
+# seconds between heartbeats of operators waiting on an add-on
+_HEARTBEAT_INTERVAL = 2.
+
+# UV islands and faces UVPackmaster's heuristic search gets through per second of budget worth spending,
+#  meshes with fewer islands than the minimum are packed without a search
+_PACK_ISLANDS_PER_SECOND = 50
+_PACK_FACES_PER_SECOND = 20000
+_PACK_MIN_SEARCH_ISLANDS = 20
+
+
+_event_sink = None
+
+
+def set_event_sink(sink):
+    """Send events to sink, a function taking the event dict, instead of the events file."""
+    global _event_sink
+    _event_sink = sink
+
+
+def emit(event: str, **fields):
+    """Report an event to the host Blender class, as a JSON line appended to the file named by the
+     PHOTOGRAMMETRY_EVENTS environment variable, or to the sink set by set_event_sink."""
+    fields = dict(fields, event=event, time=time.time())
+    if _event_sink is not None:
+        _event_sink(fields)
+        return
+    events_path = os.environ.get('PHOTOGRAMMETRY_EVENTS')
+    if events_path:
+        with open(events_path, 'a') as events_file:
+            events_file.write(json.dumps(fields) + '\n')
+
+
+def emit_progress(stage: str, done: float, total: float, **fields):
+    """Report how far a stage is as the percent done is of total, with fields such as the map being baked."""
+    emit('progress', stage=stage, percent=100 * done / total if total else 100., **fields)
+
+
+def emit_error(stage: str, message: str):
+    """Report why the stage is about to fail, the host adds it to the error it raises."""
+    emit('error', stage=stage, message=message)
+
+
+def start_heartbeat(stage: str, expected_seconds: float=None):
+    """
+    Emit a heartbeat event every _HEARTBEAT_INTERVAL seconds from Blender's event loop, while a modal operator
+     waits on an add-on. The host takes heartbeats stopping as Blender having hung, see blender.launch.Watchdog.
+    :param expected_seconds: How long the add-on should take, each heartbeat then also emits a progress event
+     with the heartbeat's iteration and the percent of expected_seconds passed, up to 99.
+    :return: Timer function to pass to stop_heartbeat.
+    """
+    iteration = 0
+
+    def heartbeat():
+        nonlocal iteration
+        iteration += 1
+        emit('heartbeat', stage=stage)
+        if expected_seconds:
+            emit_progress(stage, min(iteration * _HEARTBEAT_INTERVAL, .99 * expected_seconds), expected_seconds,
+                          iteration=iteration)
+        return _HEARTBEAT_INTERVAL
+    bpy.app.timers.register(heartbeat)
+    return heartbeat
+
+
+def stop_heartbeat(heartbeat):
+    if bpy.app.timers.is_registered(heartbeat):
+        bpy.app.timers.unregister(heartbeat)
+
+
+@contextmanager
+def exit_on_error(stage: str, heartbeat=None):
+    """
+    Stop heartbeat, report the error and exit if the body raises. Modal operators wrap their add-on call and
+     the work after it finished in it, an exception there would leave Blender open without ending the job.
+    """
+    try:
+        yield
+    except Exception as error:
+        if heartbeat is not None:
+            stop_heartbeat(heartbeat)
+        emit_error(stage, f'{type(error).__name__}: {error}')
+        sys.exit(1)
+
+
+@contextmanager
+def timed(stage: str, step: str):
+    start = time.perf_counter()
+    yield
+    emit('timing', stage=stage, step=step, seconds=time.perf_counter() - start)
+
+
+def emit_stage_summary(stage: str, input_objects, output_objects, depsgraph=None):
+    """:param depsgraph: Count the output objects' triangles with their modifiers applied, as they're exported."""
+    emit('stage', stage=stage, peak_rss=peak_rss() if _peak_rss_per_job else None,
+         input_triangles=sum(map(triangle_count, input_objects)),
+         output_triangles=sum(triangle_count(obj, depsgraph) for obj in output_objects))
+
+
+# whether peak_rss() measures the current job, see reset_peak_rss
+_peak_rss_per_job = True
+
+
+def reset_peak_rss():
+    """
+    Measure peak_rss from now on, for Blender processes which run more than one job. Only Linux can reset
+     the high-water mark, elsewhere jobs run by a worker report no peak_rss.
+    """
+    global _peak_rss_per_job
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        _peak_rss_per_job = False
+
+
+def peak_rss() -> int:
+    """Peak resident memory of this Blender in bytes, since it started or reset_peak_rss was last called."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return _windows_peak_rss()
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def _windows_peak_rss() -> int:
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters),
+                                             counters.cb)
+    return counters.PeakWorkingSetSize
+
+
+def triangle_count(obj, depsgraph=None) -> int:
+    """Triangles of obj's mesh, with its modifiers applied when given the depsgraph to evaluate it in."""
+    if depsgraph is None:
+        return int((mesh_attribute(obj.data.polygons, 'loop_total', dtype=np.int32) - 2).sum())
+    evaluated = obj.evaluated_get(depsgraph)
+    try:
+        return int((mesh_attribute(evaluated.to_mesh().polygons, 'loop_total', dtype=np.int32) - 2).sum())
+    finally:
+        evaluated.to_mesh_clear()
+
+
+def enable_addons(required=True):
+    """
+    Enable the add-ons named in the comma separated PHOTOGRAMMETRY_ADDONS environment variable, each by its
+     module name or the start of it, for example quad_remesher for quad_remesher_1_2. The latest version
+     installed, by its bl_info version, is enabled. Stages started with --factory-startup load no other
+     add-ons of the user's.
+    :param required: Exit if an add-on isn't installed, otherwise go on without it.
+    """
+    names = [name for name in os.environ.get('PHOTOGRAMMETRY_ADDONS', '').split(',') if name]
+    if not names:
+        return
+    import addon_utils
+    installed = list(addon_utils.modules())
+    for name in names:
+        matches = [module for module in installed if module.__name__.startswith(name)]
+        if not matches:
+            if not required:
+                print(f'The {name} add-on is not installed, stages using it will fail', file=sys.stderr)
+                continue
+            emit_error('startup', f'The {name} add-on is not installed')
+            sys.exit(1)
+        latest = max(matches, key=lambda module: tuple(addon_utils.module_bl_info(module).get('version', ())))
+        addon_utils.enable(latest.__name__, default_set=True)
+
+
+def script_args() -> list:
+    """Arguments given to a stage script after '--' on the Blender command line."""
+    return sys.argv[sys.argv.index('--') + 1:]
 
 
 def name_from_path(filepath: str):
@@ -24,13 +235,102 @@ def rename_active(name):
 
 
 def export_selected(filepath):
+    """
+    Export the selected objects under another name next to filepath, then move the mesh into place, so a
+     Blender killed while exporting never leaves a partial mesh at filepath. Only the extension differs, so
+     an .obj's .mtl is written under its own name, and texture paths are relative to the same folder.
+    """
     exporters = {'.obj': bpy.ops.export_scene.obj, '.fbx': bpy.ops.export_scene.fbx}
-    extension = Path(filepath).suffix
-    exporters[extension](filepath=filepath, use_selection=True, check_existing=True)
+    filepath = Path(filepath)
+    partial_path = filepath.with_suffix(f'.partial{os.getpid()}')
+    try:
+        exporters[filepath.suffix](filepath=str(partial_path), use_selection=True, check_existing=True)
+        os.replace(partial_path, filepath)
+    finally:
+        if partial_path.exists():
+            partial_path.unlink()
+
+
+def save_image(image, image_path, scene, as_render=True):
+    """
+    Save a baked image, writing it under another name first.
+    :param as_render: Save with the scene's image settings, otherwise with image.save(), which writes the
+     image's pixels as they are, the same pixels write_region_tile hands the host to encode.
+    """
+    image_path = Path(image_path)
+    partial_path = image_path.with_name(f'{image_path.name}.{os.getpid()}.partial')
+    if as_render:
+        image.save_render(str(partial_path), scene=scene)
+    else:
+        image.filepath_raw = str(partial_path)
+        image.save()
+        image.filepath_raw = str(image_path)
+    os.replace(partial_path, image_path)
 
 
 def import_from_path(filepath):
+    """Import the mesh at filepath and select it. When several stages run in one session the object
+     is already in bpy.data from a previous stage, and is selected instead of being imported again."""
+    name = name_from_path(filepath)
+    if name in bpy.data.objects:
+        bpy.ops.object.select_all(action='DESELECT')
+        bpy.data.objects[name].select_set(True)
+        return
+
+    cache_path = mesh_cache_path(filepath)
+    if cache_path is not None and cache_path.exists():
+        append_objects(cache_path)
+        return
     bpy.ops.import_scene.obj(filepath=filepath)
+    if cache_path is not None:
+        write_mesh_cache(cache_path, bpy.context.selected_objects)
+
+
+def mesh_cache_path(filepath):
+    """
+    Path of the .blend holding the objects imported from filepath, in the folder given by the
+     PHOTOGRAMMETRY_MESH_CACHE environment variable. The .obj remains the source of truth, its size and
+     modification time are part of the name so a changed .obj is imported again.
+    None if the mesh cache isn't enabled or filepath is too small to be worth caching.
+    """
+    cache_dir = os.environ.get('PHOTOGRAMMETRY_MESH_CACHE')
+    stat = os.stat(filepath)
+    if not cache_dir or stat.st_size < _MESH_CACHE_MIN_SIZE:
+        return None
+    path_hash = hashlib.sha1(str(Path(filepath).resolve()).encode()).hexdigest()
+    return Path(cache_dir) / f'{path_hash}_{stat.st_size}_{stat.st_mtime_ns}.blend'
+
+
+def write_mesh_cache(cache_path: Path, objects):
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    path_hash = cache_path.name.split('_')[0]
+    for stale_path in cache_path.parent.glob(f'{path_hash}_*.blend'):
+        try:
+            stale_path.unlink()
+        except OSError:
+            # being read by another process, it's replaced the next time
+            pass
+    partial_path = cache_path.with_name(f'{cache_path.name}.{os.getpid()}.partial')
+    bpy.data.libraries.write(str(partial_path), set(objects))
+    os.replace(partial_path, cache_path)
+
+
+def append_objects(blend_path: Path):
+    """Append every object in blend_path to the scene and select them, like an import would."""
+    with bpy.data.libraries.load(str(blend_path)) as (data_from, data_to):
+        data_to.objects = data_from.objects
+    bpy.ops.object.select_all(action='DESELECT')
+    for obj in data_to.objects:
+        bpy.context.collection.objects.link(obj)
+        obj.select_set(True)
+
+
+def reset_scene():
+    """Remove everything a previous job imported or created, for Blender processes which run
+     more than one job."""
+    for collection in (bpy.data.objects, bpy.data.meshes, bpy.data.materials, bpy.data.images):
+        for block in list(collection):
+            collection.remove(block)
 
 
 def mesh_self_intersects(bmesh) -> bool:
@@ -44,17 +344,37 @@ def bmesh_from_mesh(mesh_data):
     return bm
 
 
-def smooth_bmesh(bmesh):
-    for face, edge in zip(bmesh.faces, bmesh.edges):
-        face.smooth = True
-        edge.smooth = True
-
-
 def update_obj_from_bmesh(obj, bmesh):
     bmesh.to_mesh(obj.data)
     obj.data.update()
 
 
+def baked_texture_name(base_texture_name: str, map_type: str, extension='.png') -> str:
+    return f'{base_texture_name}_{map_type.lower()}{extension}'
+
+
+def replace_material(obj):
+    """Replace obj's material with a new node material named after obj."""
+    bpy.data.materials.remove(obj.active_material, do_unlink=True)
+    material = bpy.data.materials.new(obj.name)
+    obj.active_material = material
+    material.use_nodes = True
+    return material
+
+
+def link_baked_image(material, image_node, map_type: str):
+    """Connect a baked texture's image node to the material's principled BSDF."""
+    nodes = material.node_tree.nodes
+    node_links = material.node_tree.links
+    principled_node = nodes['Principled BSDF']
+    if map_type == 'DIFFUSE':
+        node_links.new(image_node.outputs['Color'], principled_node.inputs['Base Color'])
+    elif map_type == 'NORMAL':
+        normal_map_node = nodes.new('ShaderNodeNormalMap')
+        node_links.new(image_node.outputs['Color'], normal_map_node.inputs['Color'])
+        node_links.new(normal_map_node.outputs['Normal'], principled_node.inputs['Normal'])
+
+
 def output_modal(func, output: set):
     """Updates output with the result of func, a modal which returns a set.
      Cheap way to monitor the modal result of a bpy.Operator."""
@@ -65,6 +385,222 @@ def output_modal(func, output: set):
     return wrap
 
 
+def mesh_attribute(collection, name: str, components=1, dtype=np.float32):
+    """
+    Attribute name of every element of a mesh collection, such as mesh.vertices, read in one call.
+    :param components: Values per element, 3 for a vector. Rows of components are returned for more than 1.
+    :param dtype: float32 for float attributes, int32 for int attributes and bool for boolean ones.
+    """
+    values = np.empty(len(collection) * components, dtype=dtype)
+    collection.foreach_get(name, values)
+    return values.reshape(-1, components) if components > 1 else values
+
+
+def set_mesh_attribute(collection, name: str, values, dtype=np.float32):
+    """Set attribute name of every element of a mesh collection from values, one row or value per element."""
+    collection.foreach_set(name, np.ascontiguousarray(values, dtype=dtype).ravel())
+
+
+def fill_mesh_attribute(collection, name: str, value, dtype=bool):
+    """Set attribute name of every element of a mesh collection to value."""
+    set_mesh_attribute(collection, name, np.full(len(collection), value, dtype=dtype), dtype)
+
+
+def smooth_mesh(mesh):
+    """Shade every polygon of mesh smooth, with no sharp edges."""
+    fill_mesh_attribute(mesh.polygons, 'use_smooth', True)
+    fill_mesh_attribute(mesh.edges, 'use_edge_sharp', False)
+    mesh.update()
+
+
+def mesh_coords(mesh):
+    return mesh_attribute(mesh.vertices, 'co', 3).astype(np.float64)
+
+
+def set_mesh_coords(mesh, coords):
+    set_mesh_attribute(mesh.vertices, 'co', coords)
+    mesh.update()
+
+
+def polygon_normals(mesh):
+    return mesh_attribute(mesh.polygons, 'normal', 3).astype(np.float64)
+
+
+def polygon_loop_table(mesh):
+    """Loop indices of each polygon of mesh as a row, padded with -1 up to the largest polygon."""
+    loop_starts = mesh_attribute(mesh.polygons, 'loop_start', dtype=np.int32)
+    loop_totals = mesh_attribute(mesh.polygons, 'loop_total', dtype=np.int32)
+    width = loop_totals.max() if len(loop_totals) else 0
+    loops = loop_starts[:, None] + np.arange(width)
+    return np.where(np.arange(width) < loop_totals[:, None], loops, -1).astype(np.int64)
+
+
+def polygon_table(mesh):
+    """Vertex indices of each polygon of mesh as a row, padded with -1 up to the largest polygon."""
+    loop_verts = mesh_attribute(mesh.loops, 'vertex_index', dtype=np.int32)
+    loop_table = polygon_loop_table(mesh)
+    return np.where(loop_table >= 0, loop_verts[loop_table], -1)
+
+
+def polygon_bounds(values, table):
+    """Per polygon minimum and maximum of values, indexed by the rows of table."""
+    rows = values[np.where(table >= 0, table, table[:, :1])]
+    return rows.min(axis=1), rows.max(axis=1)
+
+
+def mesh_uvs(mesh):
+    return mesh_attribute(mesh.uv_layers.active.data, 'uv', 2).astype(np.float64)
+
+
+def set_mesh_uvs(mesh, uvs):
+    set_mesh_attribute(mesh.uv_layers.active.data, 'uv', uvs)
+    mesh.update()
+
+
+def uv_island_count(mesh) -> int:
+    """
+    Number of groups of polygons of mesh connected through corners with the same vertex and UV, the islands
+     UVPackmaster packs. Labels spread from each polygon to its neighbours until they settle.
+    """
+    if not len(mesh.polygons):
+        return 0
+    loop_table = polygon_loop_table(mesh)
+    loops = loop_table[loop_table >= 0]
+    polygons = np.broadcast_to(np.arange(len(loop_table))[:, None], loop_table.shape)[loop_table >= 0]
+    loop_verts = mesh_attribute(mesh.loops, 'vertex_index', dtype=np.int32)
+    uv_keys = np.round(mesh_attribute(mesh.uv_layers.active.data, 'uv', 2) * 1e5).astype(np.int64)
+    _, corner_keys = np.unique(np.column_stack((loop_verts, uv_keys)), axis=0, return_inverse=True)
+    corner_keys = corner_keys.ravel()[loops]
+
+    labels = np.arange(len(loop_table))
+    while True:
+        key_labels = np.full(corner_keys.max() + 1, len(labels))
+        np.minimum.at(key_labels, corner_keys, labels[polygons])
+        spread = labels.copy()
+        np.minimum.at(spread, polygons, key_labels[corner_keys])
+        # a polygon's label is a polygon whose own label is no larger, jumping to it settles long islands quicker
+        spread = spread[spread]
+        if np.array_equal(spread, labels):
+            return len(np.unique(labels))
+        labels = spread
+
+
+def heuristic_budget(islands: int, faces: int, max_seconds: int) -> int:
+    """Seconds of heuristic search worth spending on packing islands made of faces, at most max_seconds."""
+    if islands < _PACK_MIN_SEARCH_ISLANDS:
+        return 0
+    return min(max_seconds, math.ceil(islands / _PACK_ISLANDS_PER_SECOND + faces / _PACK_FACES_PER_SECOND))
+
+
+def delete_polygons(obj, polygons):
+    """Delete the polygons of obj at the given indices, along with vertices no longer used."""
+    bm = bmesh_from_mesh(obj.data)
+    bm.faces.ensure_lookup_table()
+    bmesh.ops.delete(bm, geom=[bm.faces[i] for i in polygons.tolist()], context='FACES')
+    update_obj_from_bmesh(obj, bm)
+    bm.free()
+
+
+def lod_level_path(output_path, level: int) -> Path:
+    """Path a chained LOD level is also exported to on its own, mirrored by Blender.lod_level_paths on the host."""
+    output_path = Path(output_path)
+    return output_path.with_name(f'{output_path.stem}_LOD{level}.obj')
+
+
+def lod_manifest_path(output_path) -> Path:
+    """Records which low poly and level ratio the chained LOD levels next to output_path were made from."""
+    output_path = Path(output_path)
+    return output_path.with_name(f'{output_path.stem}_lods.json')
+
+
+def region_tile_path(image_path: str, region) -> str:
+    """Mirrors blender.tiles.tile_path on the host."""
+    return f'{image_path}.{region[0]}_{region[1]}.rgba'
+
+
+def write_region_tile(image, tile_path: str, padding: int, bit_depth=8):
+    """Write image without its padding as 8 or big endian 16 bit RGBA rows, top row first, for the host
+     to encode."""
+    pixels = np.empty(len(image.pixels), dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    width, height = image.size
+    pixels = pixels.reshape(height, width, 4)[padding:height - padding, padding:width - padding]
+    max_value = 2**bit_depth - 1
+    tile = np.round(np.clip(pixels[::-1], 0, 1) * max_value).astype(np.uint8 if bit_depth == 8 else '>u2')
+    partial_path = f'{tile_path}.{os.getpid()}.partial'
+    tile.tofile(partial_path)
+    os.replace(partial_path, tile_path)
+
+
+def polygon_lists(table) -> list:
+    if (table >= 0).all():
+        return table.tolist()
+    return [row[row >= 0].tolist() for row in table]
+
+
+def furthest_displacements(vert_count: int, verts, directions, distances):
+    """Displacement of each vertex by the largest of the distances along directions given for it,
+     verts may repeat. Vertices without a distance aren't displaced."""
+    furthest = np.zeros(vert_count)
+    np.maximum.at(furthest, verts, distances)
+    is_furthest = distances == furthest[verts]
+    verts, first = np.unique(verts[is_furthest], return_index=True)
+    displacements = np.zeros((vert_count, 3))
+    displacements[verts] = directions[is_furthest][first] * distances[is_furthest][first, None]
+    return displacements
+
+
+def _overlapping_pairs(coords, table, faces, tree):
+    """(face, tree face) index pairs of the faces in table overlapping faces of tree. A tree is built
+     from only the given faces, so retesting a few moved faces doesn't rebuild one for the whole mesh."""
+    if len(faces) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    face_table = table[faces]
+    used_verts = np.unique(face_table[face_table >= 0])
+    local_verts = np.full(len(coords), -1, dtype=np.int64)
+    local_verts[used_verts] = np.arange(len(used_verts))
+    local_table = np.where(face_table >= 0, local_verts[face_table], -1)
+    faces_tree = bvhtree.BVHTree.FromPolygons(coords[used_verts].tolist(), polygon_lists(local_table))
+    pairs = np.array(faces_tree.overlap(tree), dtype=np.int64).reshape(-1, 2)
+    pairs[:, 0] = faces[pairs[:, 0]]
+    return pairs
+
+
+# UVPackmaster's own modal, before output_modal wraps it
+_uvp_modal = None
+
+
+def monitor_uvp_modal(output: set):
+    """Have UVPackmaster's pack operator add the results of its modal to output. Imported when first used,
+     UVPackmaster is only enabled in Blenders which pack."""
+    global _uvp_modal
+    from uvpackmaster2.operator import UVP2_OT_PackOperatorGeneric
+    if _uvp_modal is None:
+        _uvp_modal = UVP2_OT_PackOperatorGeneric.modal
+    UVP2_OT_PackOperatorGeneric.modal = output_modal(_uvp_modal, output)
+
+
+def monitor_new_objects(output: set):
+    """
+    Add the names of objects added to the scene from now on to output, as Blender's depsgraph updates.
+     QuadRemesher's operator returns once it started its engine and imports the retopo later, so unlike
+     UVPackmaster there's no modal result to wrap, the retopo object appearing is its completion.
+    :return: The handler, for stop_monitoring.
+    """
+    existing = set(bpy.data.objects.keys())
+
+    def handler(scene, depsgraph):
+        output.update(update.id.name for update in depsgraph.updates
+                      if isinstance(update.id, bpy.types.Object) and update.id.name not in existing)
+    bpy.app.handlers.depsgraph_update_post.append(handler)
+    return handler
+
+
+def stop_monitoring(handler):
+    if handler in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(handler)
+
+
 class AutomateMacro(bpy.types.Macro):
     bl_idname = "wm.automation_macro"
     bl_label = "Automation Macro"
@@ -79,52 +615,91 @@ class OBJECT_OT_automate_remesh(Operator):
     adaptive_size = IntProperty(default=50)
     hard_edges_by_angle = BoolProperty(default=True)
     disallow_intersecting = BoolProperty(default=True)
+    export: BoolProperty(default=True)
 
     def execute(self, context):
-        import_from_path(self.high_poly_path)
+        emit('started', stage='remesh')
+        with timed('remesh', 'import'):
+            import_from_path(self.high_poly_path)
         high_poly_name = name_from_path(self.high_poly_path)
         set_active_by_name(high_poly_name)
+        self.high_poly_obj = bpy.data.objects[high_poly_name]
 
         props = context.scene.qremesher
         props.target_count = self.target_count
         props.adaptive_size = self.adaptive_size
         props.autodetect_hard_edges = self.hard_edges_by_angle
 
+        self.new_objects = set()
+        self.monitor = monitor_new_objects(self.new_objects)
         context.window_manager.modal_handler_add(self)
-        return bpy.ops.qremesher.remesh()
+        self.remesh_start = time.perf_counter()
+        self.heartbeat = start_heartbeat('remesh')
+        with exit_on_error('remesh', self.heartbeat):
+            result = bpy.ops.qremesher.remesh()
+        if 'CANCELLED' in result:
+            # QuadRemesher didn't start its engine, exit instead of waiting for a retopo which never comes
+            stop_monitoring(self.monitor)
+            stop_heartbeat(self.heartbeat)
+            emit_error('remesh', 'QuadRemesher cancelled remeshing')
+            sys.exit(1)
+        return result
 
     def modal(self, context, event):
-        if len(bpy.data.objects) == 2:
-            low_poly_name = name_from_path(self.low_poly_path)
-            # Retopo is already selected by QuadRemesher
-            rename_active(low_poly_name)
-            low_poly_obj = context.active_object
-            low_poly_bmesh = bmesh_from_mesh(low_poly_obj.data)
+        # QuadRemesher is done once it added the retopo object, other objects may be in the scene already
+        if self.new_objects:
+            stop_monitoring(self.monitor)
+            stop_heartbeat(self.heartbeat)
+            emit('timing', stage='remesh', step='quadremesher', seconds=time.perf_counter() - self.remesh_start)
+            with exit_on_error('remesh'):
+                self._finish(context)
+            return {'FINISHED'}
+        return {'PASS_THROUGH'}
+
+    def _finish(self, context):
+        """Check, triangulate and export the retopo QuadRemesher added."""
+        low_poly_name = name_from_path(self.low_poly_path)
+        # Retopo is already selected by QuadRemesher
+        rename_active(low_poly_name)
+        low_poly_obj = context.active_object
+        low_poly_bmesh = bmesh_from_mesh(low_poly_obj.data)
+        with timed('remesh', 'intersection check'):
             if self.disallow_intersecting and mesh_self_intersects(low_poly_bmesh):
+                emit_error('remesh', 'the remeshed low poly intersects itself')
                 sys.exit(2)
 
-            smooth_bmesh(low_poly_bmesh)
-            bmesh.ops.triangulate(low_poly_bmesh, faces=low_poly_bmesh.faces,
-                                  quad_method='BEAUTY', ngon_method='BEAUTY')
-            update_obj_from_bmesh(low_poly_obj, low_poly_bmesh)
-            export_selected(self.low_poly_path)
-            return {'FINISHED'}
-        return {'PASS_THROUGH'}
+        bmesh.ops.triangulate(low_poly_bmesh, faces=low_poly_bmesh.faces,
+                              quad_method='BEAUTY', ngon_method='BEAUTY')
+        update_obj_from_bmesh(low_poly_obj, low_poly_bmesh)
+        smooth_mesh(low_poly_obj.data)
+        if self.export:
+            with timed('remesh', 'export'):
+                export_selected(self.low_poly_path)
+        emit_stage_summary('remesh', [self.high_poly_obj], [low_poly_obj])
 
 
 class UV_OT_automate_unwrap(Operator):
     bl_idname = 'uv.automate_unwrap'
     bl_label = 'Automate Unwrap'
     filepath: StringProperty()
+    export: BoolProperty(default=True)
 
     def execute(self, context):
-        import_from_path(self.filepath)
+        emit('started', stage='unwrap')
+        with timed('unwrap', 'import'):
+            import_from_path(self.filepath)
         object_name = name_from_path(self.filepath)
         set_active_by_name(object_name)
         bpy.ops.object.mode_set(mode='EDIT')
-        bpy.ops.uv.auto_seams_unwrap(grow_iterations=5, merge_iterations=5,
-                                     small_island_threshold=300)
-        export_selected(self.filepath)
+        with timed('unwrap', 'auto seams unwrap'):
+            bpy.ops.uv.auto_seams_unwrap(grow_iterations=5, merge_iterations=5,
+                                         small_island_threshold=300)
+        bpy.ops.object.mode_set(mode='OBJECT')
+        if self.export:
+            with timed('unwrap', 'export'):
+                export_selected(self.filepath)
+        obj = bpy.data.objects[object_name]
+        emit_stage_summary('unwrap', [obj], [obj])
         return {'FINISHED'}
 
 
@@ -134,31 +709,77 @@ class UV_OT_automate_pack(Operator):
     filepath = StringProperty()
     margin = FloatProperty(default=0.005)
     heuristic_search_time = IntProperty(default=10)
+    # search for as long as the mesh's islands and faces are worth, with heuristic_search_time as the most
+    scale_heuristic: BoolProperty(default=False)
+    export: BoolProperty(default=True)
+    # remove the mesh once exported, when several meshes are packed one after another in one session
+    unload: BoolProperty(default=False)
 
     def execute(self, context):
-        import_from_path(self.filepath)
+        emit('started', stage='pack')
+        with timed('pack', 'import'):
+            import_from_path(self.filepath)
         object_name = name_from_path(self.filepath)
+        obj = bpy.data.objects[object_name]
+        bpy.ops.object.select_all(action='DESELECT')
+        obj.select_set(True)
         set_active_by_name(object_name)
+
+        search_time = self.heuristic_search_time
+        if self.scale_heuristic:
+            with timed('pack', 'count islands'):
+                islands = uv_island_count(obj.data)
+            search_time = heuristic_budget(islands, len(obj.data.polygons), self.heuristic_search_time)
+            emit('heuristic', stage='pack', object=object_name, islands=islands, seconds=search_time)
+
         bpy.ops.object.mode_set(mode='EDIT')
         bpy.ops.uv.select_all(action='SELECT')
 
         uvp_properties = context.scene.uvp2_props
         uvp_properties.margin = self.margin
-        uvp_properties.heuristic_enable = True
-        uvp_properties.heuristic_search_time = self.heuristic_search_time
+        # a search time of 0 would search until cancelled
+        uvp_properties.heuristic_enable = search_time > 0
+        uvp_properties.heuristic_search_time = search_time
 
         self.uvp_modal_output = set()
-        UVP2_OT_PackOperatorGeneric.modal = output_modal(
-            UVP2_OT_PackOperatorGeneric.modal, self.uvp_modal_output)
+        monitor_uvp_modal(self.uvp_modal_output)
         context.window_manager.modal_handler_add(self)
-        return bpy.ops.uvpackmaster2.uv_pack()
+        self.pack_start = time.perf_counter()
+        self.heartbeat = start_heartbeat('pack', search_time)
+        with exit_on_error('pack', self.heartbeat):
+            result = bpy.ops.uvpackmaster2.uv_pack()
+        if 'CANCELLED' in result:
+            # UVPackmaster refused to start, its modal never runs
+            stop_heartbeat(self.heartbeat)
+            emit_error('pack', 'UVPackmaster cancelled packing')
+            sys.exit(1)
+        return result
 
     def modal(self, context, event):
+        if 'CANCELLED' in self.uvp_modal_output:
+            # UVPackMaster gave up, exit instead of waiting for a FINISHED which never comes
+            stop_heartbeat(self.heartbeat)
+            emit_error('pack', 'UVPackmaster cancelled packing')
+            sys.exit(1)
         if 'FINISHED' in self.uvp_modal_output:
-            export_selected(self.filepath)
+            stop_heartbeat(self.heartbeat)
+            emit('timing', stage='pack', step='uvpackmaster', seconds=time.perf_counter() - self.pack_start)
+            with exit_on_error('pack'):
+                self._finish(context)
             return {'FINISHED'}
         return {'RUNNING_MODAL'}
 
+    def _finish(self, context):
+        """Export the packed mesh."""
+        bpy.ops.object.mode_set(mode='OBJECT')
+        if self.export:
+            with timed('pack', 'export'):
+                export_selected(self.filepath)
+        obj = context.active_object
+        emit_stage_summary('pack', [obj], [obj])
+        if self.unload:
+            bpy.data.meshes.remove(obj.data)
+
 
 class OBJECT_OT_automate_create_cage(Operator):
     bl_idname = 'object.automate_create_cage'
@@ -166,11 +787,16 @@ class OBJECT_OT_automate_create_cage(Operator):
     high_poly_path = StringProperty()
     low_poly_path = StringProperty()
     cage_path = StringProperty()
+    inflate_max_iterations: IntProperty(default=50)
+    inflate_time_budget: FloatProperty(default=60)
+    export: BoolProperty(default=True)
     _CAGE_PADDING = .0001
 
     def execute(self, context):
-        import_from_path(self.high_poly_path)
-        import_from_path(self.low_poly_path)
+        emit('started', stage='create_cage')
+        with timed('create_cage', 'import'):
+            import_from_path(self.high_poly_path)
+            import_from_path(self.low_poly_path)
 
         high_poly_name = name_from_path(self.high_poly_path)
         low_poly_name = name_from_path(self.low_poly_path)
@@ -191,79 +817,131 @@ class OBJECT_OT_automate_create_cage(Operator):
 
         high_poly_bmesh = bmesh_from_mesh(high_poly_obj.data)
         cage_bmesh = bmesh_from_mesh(cage_obj.data)
-        if mesh_self_intersects(cage_bmesh):
+        with timed('create_cage', 'intersection check'):
+            cage_intersects = mesh_self_intersects(cage_bmesh)
+        if cage_intersects:
+            emit_error('create_cage', 'the low poly intersects itself')
             sys.exit(2)
 
-        # baseline inflation for low poly/cage intersections
-        for face in cage_bmesh.faces:
-            face_normal = face.normal.copy()
-            for vert in face.verts:
-                vert.co += face_normal * self._CAGE_PADDING
-        update_obj_from_bmesh(cage_obj, cage_bmesh)
+        # baseline inflation for low poly/cage intersections, each vertex moves along the normals of its faces
+        coords = mesh_coords(cage_obj.data)
+        table = polygon_table(cage_obj.data)
+        corner_normals = np.broadcast_to(polygon_normals(cage_obj.data)[:, None], table.shape + (3,))
+        np.add.at(coords, table[table >= 0], corner_normals[table >= 0] * self._CAGE_PADDING)
+        set_mesh_coords(cage_obj.data, coords)
         cage_obj.hide_set(True)
 
-        scene = context.scene
-        view_layer = context.view_layer
-
         # raycast & move cage faces to high poly
-        cage_bmesh.faces.ensure_lookup_table()
-        cage_bmesh.faces.index_update()
-        cage_bmesh.verts.ensure_lookup_table()
-        for face in cage_bmesh.faces:
-            ray_origin = face.calc_center_median_weighted()
-            # raycast to search for high poly face
-            hit, hit_point, hit_normal, hit_index, hit_object, _ = scene.ray_cast(
-                view_layer, origin=ray_origin, direction=face.normal)
-            if hit and hit_object is low_poly_obj:
-                if not self._normals_are_facing(face.normal, hit_normal):
-                    # point inside low poly, recast from hit point
-                    hit, hit_point, hit_normal, _, hit_object, _ = scene.ray_cast(
-                        view_layer, origin=hit_point, direction=face.normal)
-            if hit and hit_object is high_poly_obj:
-                if not self._normals_are_facing(face.normal, hit_normal):
-                    face_normal = face.normal.copy()
-                    for vert in face.verts:
-                        distance = (hit_point - vert.co).dot(face_normal)
-                        if distance > 0:
-                            vert.co += face_normal * (distance + self._CAGE_PADDING)
-
-        self._inflate_beyond_intersection(cage_bmesh, high_poly_bmesh)
-
-        update_obj_from_bmesh(cage_obj, cage_bmesh)
+        high_poly_tree = bvhtree.BVHTree.FromBMesh(high_poly_bmesh)
+        low_poly_tree = bvhtree.BVHTree.FromBMesh(bmesh_from_mesh(low_poly_obj.data))
+        with timed('create_cage', 'raycast'):
+            self._push_to_high_poly(cage_obj.data, high_poly_tree, low_poly_tree)
+
+        with timed('create_cage', 'inflate'):
+            remaining_overlaps = self._inflate_beyond_intersection(cage_obj.data, high_poly_obj.data,
+                                                                   high_poly_tree)
+        emit('overlaps', stage='create_cage', remaining=remaining_overlaps)
+        self.report({'INFO'}, f'{remaining_overlaps} overlapping cage and high poly faces remain')
+
         set_active_by_name(cage_obj.name)
         rename_active(cage_name)
         bpy.ops.object.select_all(action='DESELECT')
         cage_obj.hide_set(False)
         cage_obj.select_set(True)
         cage_obj.data.materials.clear()
-        export_selected(self.cage_path)
+        if self.export:
+            with timed('create_cage', 'export'):
+                export_selected(self.cage_path)
+        emit_stage_summary('create_cage', [high_poly_obj, low_poly_obj], [cage_obj])
         return {'FINISHED'}
 
-    def _inflate_beyond_intersection(self, bmesh_a, bmesh_b):
-        bmesh_a.faces.ensure_lookup_table()
-        bmesh_b.faces.ensure_lookup_table()
-        bmesh_a_tree = bvhtree.BVHTree.FromBMesh(bmesh_a)
-        bmesh_b_tree = bvhtree.BVHTree.FromBMesh(bmesh_b)
-
-        intersecting_polygons = bmesh_a_tree.overlap(bmesh_b_tree)
-        while intersecting_polygons:
-            intersect_len = len(intersecting_polygons)
-            for a_index, b_index in intersecting_polygons:
-                a_face = bmesh_a.faces[a_index]
-                b_face = bmesh_b.faces[b_index]
-
-                a_face_normal = a_face.normal.copy()
-                for a_vert in a_face.verts:
-                    for b_vert in b_face.verts:
-                        distance = (b_vert.co - a_vert.co).dot(a_face_normal)
-                        if distance > 0:
-                            a_vert.co += a_face_normal * (distance + self._CAGE_PADDING)
-
-            bmesh_a_tree = bvhtree.BVHTree.FromBMesh(bmesh_a)
-            intersecting_polygons = bmesh_a_tree.overlap(bmesh_b_tree)
-            if len(intersecting_polygons) == intersect_len:
+    def _push_to_high_poly(self, cage_mesh, high_poly_tree, low_poly_tree):
+        """
+        Cast a ray along the normal of each cage face, a face which is inside the high poly, hitting the
+         back of a high poly face, has its vertices pushed past the hit point by _CAGE_PADDING.
+         Rays blocked by the front of a low poly face are ignored.
+        A vertex shared by several pushed faces is moved by the furthest push only.
+        """
+        polygon_count = len(cage_mesh.polygons)
+        centers = mesh_attribute(cage_mesh.polygons, 'center', 3)
+        normals = polygon_normals(cage_mesh)
+
+        hit_points = np.zeros((polygon_count, 3))
+        is_hit = np.zeros(polygon_count, dtype=bool)
+        for i, (center, normal) in enumerate(zip(centers.tolist(), normals.tolist())):
+            hit_point, hit_normal, _, hit_distance = high_poly_tree.ray_cast(center, normal)
+            if hit_point is None or self._normals_are_facing(Vector(normal), hit_normal):
+                continue
+            low_point, low_normal, _, low_distance = low_poly_tree.ray_cast(center, normal)
+            if low_point is not None and low_distance < hit_distance and \
+                    self._normals_are_facing(Vector(normal), low_normal):
+                continue
+            hit_points[i] = hit_point
+            is_hit[i] = True
+
+        coords = mesh_coords(cage_mesh)
+        table = polygon_table(cage_mesh)[is_hit]
+        hit_normals = normals[is_hit]
+        distances = np.einsum('ij,ij->i', hit_points[is_hit], hit_normals)[:, None] - \
+            np.einsum('ikj,ij->ik', coords[table], hit_normals)
+        coords += self._corner_displacements(len(coords), table, hit_normals, distances)
+        set_mesh_coords(cage_mesh, coords)
+
+    def _inflate_beyond_intersection(self, cage_mesh, high_poly_mesh, high_poly_tree) -> int:
+        """
+        Push vertices of cage faces which overlap high poly faces past the high poly face's vertices.
+         After the first pass, only faces with a vertex moved by the previous pass are tested again,
+         using a tree of just those faces.
+        Stops once the number of overlaps stops changing, or after inflate_max_iterations passes or
+         inflate_time_budget seconds.
+        :return: Number of overlapping cage and high poly faces which remain.
+        """
+        start = time.perf_counter()
+        coords = mesh_coords(cage_mesh)
+        table = polygon_table(cage_mesh)
+        normals = polygon_normals(cage_mesh)
+        high_poly_coords = mesh_coords(high_poly_mesh)
+        high_poly_table = polygon_table(high_poly_mesh)
+
+        pairs = _overlapping_pairs(coords, table, np.arange(len(table)), high_poly_tree)
+        # pairs whose cage face wasn't moved by the pass that tested them, they won't be moved by another
+        stable_pairs = pairs[:0]
+        for iteration in range(self.inflate_max_iterations):
+            if len(pairs) == 0 or time.perf_counter() - start > self.inflate_time_budget:
+                break
+            overlap_count = len(pairs) + len(stable_pairs)
+            emit_progress('create_cage', iteration, self.inflate_max_iterations, iteration=iteration,
+                          overlaps=overlap_count)
+
+            pair_table = table[pairs[:, 0]]
+            pair_normals = normals[pairs[:, 0]]
+            high_poly_heights = np.einsum('ikj,ij->ik', high_poly_coords[high_poly_table[pairs[:, 1]]],
+                                          pair_normals)
+            high_poly_heights[high_poly_table[pairs[:, 1]] < 0] = -np.inf
+            distances = high_poly_heights.max(axis=1)[:, None] - np.einsum('ikj,ij->ik', coords[pair_table],
+                                                                           pair_normals)
+            displacements = self._corner_displacements(len(coords), pair_table, pair_normals, distances)
+            coords += displacements
+
+            is_moved = displacements.any(axis=1)
+            is_dirty = (is_moved[table] & (table >= 0)).any(axis=1)
+            stable_pairs = np.concatenate((stable_pairs, pairs))
+            stable_pairs = stable_pairs[~is_dirty[stable_pairs[:, 0]]]
+            pairs = _overlapping_pairs(coords, table, np.flatnonzero(is_dirty), high_poly_tree)
+            if len(pairs) + len(stable_pairs) == overlap_count:
                 # mesh is stable, remaining intersections shouldn't interfere with baking
-                return
+                break
+
+        set_mesh_coords(cage_mesh, coords)
+        return len(pairs) + len(stable_pairs)
+
+    def _corner_displacements(self, vert_count: int, table, face_normals, distances):
+        """Displacements pushing the vertices of the faces in table along their face normal by their
+         positive distances plus _CAGE_PADDING, the furthest push wins for shared vertices."""
+        is_pushed = (table >= 0) & (distances > 0)
+        directions = np.repeat(face_normals[:, None], table.shape[1], axis=1)[is_pushed]
+        return furthest_displacements(vert_count, table[is_pushed], directions,
+                                      distances[is_pushed] + self._CAGE_PADDING)
 
     def _normals_are_facing(self, normal_a: Vector, normal_b: Vector) -> bool:
         return normal_a.dot(normal_b) < 0
@@ -282,6 +960,7 @@ class OBJECT_OT_automate_bake(Operator):
     height: IntProperty()
     tile_x: IntProperty(default=256)
     tile_y: IntProperty(default=256)
+    threads: IntProperty(default=0)
     margin: IntProperty()
     output_path: StringProperty()
     high_poly_path: StringProperty()
@@ -289,11 +968,19 @@ class OBJECT_OT_automate_bake(Operator):
     cage_path: StringProperty()
     base_texture_name: StringProperty()
     map_types: StringProperty()
+    export: BoolProperty(default=True)
+    # (x0, y0, x1, y1) pixels to bake on their own, all zero bakes the whole texture
+    region: IntVectorProperty(size=4)
+    texture_format: StringProperty(default='PNG')
+    # write the pixels for the host to encode instead of saving the textures
+    encode_on_host: BoolProperty(default=False)
 
     def execute(self, context):
-        import_from_path(self.high_poly_path)
-        import_from_path(self.low_poly_path)
-        import_from_path(self.cage_path)
+        emit('started', stage='bake')
+        with timed('bake', 'import'):
+            import_from_path(self.high_poly_path)
+            import_from_path(self.low_poly_path)
+            import_from_path(self.cage_path)
 
         high_poly_name = name_from_path(self.high_poly_path)
         low_poly_name = name_from_path(self.low_poly_path)
@@ -302,8 +989,8 @@ class OBJECT_OT_automate_bake(Operator):
         high_poly_obj = bpy.data.objects[high_poly_name]
         low_poly_obj = bpy.data.objects[low_poly_name]
 
-        for edge in list(high_poly_obj.data.edges) + list(low_poly_obj.data.edges):
-            edge.use_edge_sharp = False
+        for obj in (high_poly_obj, low_poly_obj):
+            fill_mesh_attribute(obj.data.edges, 'use_edge_sharp', False)
 
         bpy.ops.object.select_all(action='DESELECT')
         high_poly_obj.select_set(True)
@@ -311,59 +998,151 @@ class OBJECT_OT_automate_bake(Operator):
         bpy.ops.object.shade_smooth()
         set_active_by_name(low_poly_name)
 
-        low_poly_mat = low_poly_obj.active_material
-        bpy.data.materials.remove(low_poly_mat, do_unlink=True)
-        low_poly_mat = bpy.data.materials.new(low_poly_name)
-        low_poly_obj.active_material = low_poly_mat
+        width, height, padding = self.width, self.height, 0
+        in_region = True
+        if any(self.region):
+            with timed('bake', 'cull to region'):
+                in_region = self._cull_to_region(high_poly_obj, low_poly_obj, bpy.data.objects[self.cage_name])
+            x0, y0, x1, y1 = self.region
+            padding = self.margin
+            width, height = x1 - x0 + 2 * padding, y1 - y0 + 2 * padding
 
-        low_poly_mat.use_nodes = True
+        low_poly_mat = replace_material(low_poly_obj)
         nodes = low_poly_mat.node_tree.nodes
-        node_links = low_poly_mat.node_tree.links
-        principled_node = nodes['Principled BSDF']
 
         render_settings = context.scene.render
         render_settings.tile_x = self.tile_x
         render_settings.tile_y = self.tile_y
+        if self.threads > 0:
+            render_settings.threads_mode = 'FIXED'
+            render_settings.threads = self.threads
+        file_format, extension, color_depth, float_buffer = TEXTURE_FORMATS[self.texture_format]
         image_settings = render_settings.image_settings
-        image_settings.color_depth = '16'
-        image_settings.file_format = 'PNG'
+        image_settings.color_depth = color_depth
+        image_settings.file_format = file_format
         image_settings.color_mode = 'RGBA'
         image_settings.compression = 15
         image_settings.quality = 100
-
-        for map_type in self.map_types.split():
-            image_name = f'{self.base_texture_name}_{map_type.lower()}.png'
-            image = bpy.data.images.new(image_name, alpha=True, width=self.width, height=self.height)
-            image.filepath = os.path.join(self.output_path, image_name)
+        if file_format == 'TIFF':
+            image_settings.tiff_codec = 'NONE'
+        # formats saved with the scene's settings aren't put through the Filmic view
+        context.scene.view_settings.view_transform = 'Standard'
+        write_tiles = any(self.region) or self.encode_on_host
+        tile_region = self.region if any(self.region) else (0, 0, width, height)
+
+        map_types = self.map_types.split()
+        for i, map_type in enumerate(map_types):
+            emit_progress('bake', i, len(map_types), map_type=map_type)
+            image_name = baked_texture_name(self.base_texture_name, map_type, extension)
+            image_path = os.path.join(self.output_path, image_name)
+            image = bpy.data.images.new(image_name, alpha=True, width=width, height=height,
+                                        float_buffer=float_buffer)
+            image.filepath = image_path
+            if float_buffer and map_type in ('NORMAL', 'OS_NORMAL'):
+                # normals are data, saved without the view transform's sRGB curve
+                image.colorspace_settings.is_data = True
 
             image_node = nodes.new(type='ShaderNodeTexImage')
             image_node.image = image
             nodes.active = image_node
 
-            if map_type == 'OS_NORMAL':
-                self._bake(map_type='NORMAL', normal_space='OBJECT')
-            else:
-                self._bake(map_type)
-            image.save()
-
-            if map_type == 'DIFFUSE':
-                node_links.new(image_node.outputs['Color'], principled_node.inputs['Base Color'])
-            elif map_type == 'NORMAL':
-                normal_map_node = nodes.new('ShaderNodeNormalMap')
-                node_links.new(image_node.outputs['Color'], normal_map_node.inputs['Color'])
-                node_links.new(normal_map_node.outputs['Normal'], principled_node.inputs['Normal'])
+            # a region without any of the low poly keeps the new image's background
+            if in_region:
+                with timed('bake', f'bake {map_type}'):
+                    if map_type == 'OS_NORMAL':
+                        self._bake(map_type='NORMAL', normal_space='OBJECT')
+                    else:
+                        self._bake(map_type)
+            with timed('bake', f'save {map_type}'):
+                if write_tiles:
+                    write_region_tile(image, region_tile_path(image_path, tile_region), padding, int(color_depth))
+                else:
+                    save_image(image, image_path, context.scene, as_render=self.texture_format != 'PNG')
+            link_baked_image(low_poly_mat, image_node, map_type)
+        emit_progress('bake', len(map_types), len(map_types))
 
         bpy.ops.object.select_all(action='DESELECT')
         low_poly_obj.select_set(True)
-        export_selected(self.low_poly_path)
+        if self.export:
+            with timed('bake', 'export'):
+                export_selected(self.low_poly_path)
+        emit_stage_summary('bake', [high_poly_obj, low_poly_obj], [low_poly_obj])
         return {'FINISHED'}
 
+    def _cull_to_region(self, high_poly_obj, low_poly_obj, cage_obj) -> bool:
+        """
+        Delete the low poly and cage faces whose UVs are further than margin from the region, and the high
+         poly faces outside the bounds of what's left, then map the region and its margin onto the whole
+         UV square so it's baked to an image of its own size.
+        False if no face of the low poly is in the region.
+        """
+        x0, y0, x1, y1 = self.region
+        window_min = np.array([x0 - self.margin, y0 - self.margin])
+        window_max = np.array([x1 + self.margin, y1 + self.margin])
+        texture_size = np.array([self.width, self.height])
+        low_mesh = low_poly_obj.data
+        uv_min, uv_max = polygon_bounds(mesh_uvs(low_mesh) * texture_size, polygon_loop_table(low_mesh))
+        outside = ((uv_max < window_min) | (uv_min > window_max)).any(axis=1)
+        if outside.all():
+            return False
+        # the cage is an inflated copy of the low poly, its faces have the same indices
+        delete_polygons(low_poly_obj, np.flatnonzero(outside))
+        delete_polygons(cage_obj, np.flatnonzero(outside))
+        set_mesh_uvs(low_mesh, (mesh_uvs(low_mesh) * texture_size - window_min) / (window_max - window_min))
+
+        # rays go from the cage to the low poly, leave some room for high poly hits just past the low poly
+        coords = np.concatenate([mesh_coords(low_mesh), mesh_coords(cage_obj.data)])
+        bounds_min, bounds_max = coords.min(axis=0), coords.max(axis=0)
+        slack = np.linalg.norm(bounds_max - bounds_min) * .05
+        high_mesh = high_poly_obj.data
+        face_min, face_max = polygon_bounds(mesh_coords(high_mesh), polygon_table(high_mesh))
+        outside = ((face_max < bounds_min - slack) | (face_min > bounds_max + slack)).any(axis=1)
+        delete_polygons(high_poly_obj, np.flatnonzero(outside))
+        return True
+
     def _bake(self, map_type, normal_space='TANGENT'):
         bpy.ops.object.bake(type=map_type, use_selected_to_active=True, cage_object=self.cage_name,
                             use_cage=True, margin=self.margin, normal_space=normal_space,
                             pass_filter={'COLOR'})
 
 
+class OBJECT_OT_automate_bake_material(Operator):
+    """Set up the low poly's material with textures baked by separate OBJECT_OT_automate_bake runs."""
+    bl_idname = 'object.automate_bake_material'
+    bl_label = 'Automate Baked Material'
+    low_poly_path: StringProperty()
+    output_path: StringProperty()
+    base_texture_name: StringProperty()
+    map_types: StringProperty()
+    texture_format: StringProperty(default='PNG')
+    export: BoolProperty(default=True)
+
+    def execute(self, context):
+        emit('started', stage='bake_material')
+        with timed('bake_material', 'import'):
+            import_from_path(self.low_poly_path)
+        low_poly_name = name_from_path(self.low_poly_path)
+        low_poly_obj = bpy.data.objects[low_poly_name]
+        set_active_by_name(low_poly_name)
+
+        low_poly_mat = replace_material(low_poly_obj)
+        extension = TEXTURE_FORMATS[self.texture_format][1]
+        for map_type in self.map_types.split():
+            image_name = baked_texture_name(self.base_texture_name, map_type, extension)
+            image_path = os.path.join(self.output_path, image_name)
+            image_node = low_poly_mat.node_tree.nodes.new(type='ShaderNodeTexImage')
+            image_node.image = bpy.data.images.load(image_path)
+            link_baked_image(low_poly_mat, image_node, map_type)
+
+        bpy.ops.object.select_all(action='DESELECT')
+        low_poly_obj.select_set(True)
+        if self.export:
+            with timed('bake_material', 'export'):
+                export_selected(self.low_poly_path)
+        emit_stage_summary('bake_material', [low_poly_obj], [low_poly_obj])
+        return {'FINISHED'}
+
+
 class OBJECT_OT_generate_lod(Operator):
     bl_idname = 'object.generate_lod'
     bl_label = 'Automate LOD Creation'
@@ -371,9 +1150,15 @@ class OBJECT_OT_generate_lod(Operator):
     output_path: StringProperty()
     number_of_levels: IntProperty(default=1)
     level_ratio: FloatProperty(default=.5)
+    # decimate each level from the previous applied one, exporting it on its own, instead of all from LOD0
+    chain: BoolProperty(default=False)
+    # remove the levels once exported, when several assets run one after another in one session
+    unload: BoolProperty(default=False)
 
     def execute(self, context):
-        import_from_path(self.low_poly_path)
+        emit('started', stage='generate_lod')
+        with timed('generate_lod', 'import'):
+            import_from_path(self.low_poly_path)
         object_name = name_from_path(self.output_path)
 
         low_poly_obj = context.selected_objects[0]
@@ -381,24 +1166,81 @@ class OBJECT_OT_generate_lod(Operator):
         low_poly_obj.data.name = f'{object_name}_LOD0'
         low_poly_obj.active_material.name = object_name
 
-        current_ratio = self.level_ratio
-        for i in range(1, self.number_of_levels):
-            bpy.ops.object.select_all(action='DESELECT')
-            low_poly_obj.select_set(True)
-            set_active_by_name(low_poly_obj.name)
-            bpy.ops.object.duplicate()
-
-            new_lod = context.active_object
-            new_lod.name = f'{object_name}_LOD{i}'
-            new_lod.data.name = f'{object_name}_LOD{i}'
+        if self.chain:
+            lods = self._chain_levels(context, low_poly_obj, object_name)
+        else:
+            lods = [low_poly_obj]
+            current_ratio = self.level_ratio
+            for i in range(1, self.number_of_levels):
+                new_lod = self._duplicate(context, low_poly_obj, f'{object_name}_LOD{i}')
+                decimate = new_lod.modifiers.new(f'decimate', type='DECIMATE')
+                decimate.ratio = current_ratio
+                current_ratio *= self.level_ratio
+                lods.append(new_lod)
 
-            decimate = new_lod.modifiers.new(f'decimate', type='DECIMATE')
-            decimate.ratio = current_ratio
-            current_ratio *= self.level_ratio
-
-        bpy.ops.export_scene.fbx(filepath=self.output_path)
+        bpy.ops.object.select_all(action='DESELECT')
+        for lod in lods:
+            lod.select_set(True)
+        # unchained decimate modifiers are applied while exporting
+        with timed('generate_lod', 'export' if self.chain else 'decimate and export'):
+            export_selected(self.output_path)
+        # every level, unchained ones counted with their decimate modifiers applied
+        emit_stage_summary('generate_lod', [low_poly_obj], lods, context.evaluated_depsgraph_get())
+        if self.unload:
+            for lod in lods:
+                bpy.data.meshes.remove(lod.data)
         return {'FINISHED'}
 
+    def _chain_levels(self, context, low_poly_obj, object_name) -> list:
+        """
+        LOD0 followed by each level decimated from the one before it, with its modifier applied, and exported
+         to lod_level_path. Levels exported by an earlier run from the same low poly and level_ratio are
+         imported instead, so only levels past those are decimated.
+        """
+        manifest_path = lod_manifest_path(self.output_path)
+        stat = os.stat(self.low_poly_path)
+        manifest = {'source': f'{stat.st_size}_{stat.st_mtime_ns}', 'level_ratio': self.level_ratio, 'levels': 1}
+        cached_levels = 0
+        if manifest_path.exists():
+            previous = json.loads(manifest_path.read_text())
+            if previous['source'] == manifest['source'] and previous['level_ratio'] == self.level_ratio:
+                cached_levels = previous['levels']
+
+        lods = [low_poly_obj]
+        for i in range(1, self.number_of_levels):
+            level_path = lod_level_path(self.output_path, i)
+            if i < cached_levels and level_path.exists():
+                with timed('generate_lod', 'import cached levels'):
+                    import_from_path(str(level_path))
+                lods.append(bpy.data.objects[level_path.stem])
+                continue
+            # levels after one which is made again are made from it, the cached ones are stale
+            cached_levels = 0
+            with timed('generate_lod', 'decimate'):
+                new_lod = self._duplicate(context, lods[-1], level_path.stem)
+                decimate = new_lod.modifiers.new('decimate', type='DECIMATE')
+                decimate.ratio = self.level_ratio
+                bpy.ops.object.modifier_apply(modifier=decimate.name)
+            with timed('generate_lod', 'export levels'):
+                export_selected(level_path)
+            lods.append(new_lod)
+            manifest['levels'] = i + 1
+            partial_path = manifest_path.with_name(f'{manifest_path.name}.{os.getpid()}.partial')
+            partial_path.write_text(json.dumps(manifest))
+            os.replace(partial_path, manifest_path)
+        return lods
+
+    def _duplicate(self, context, obj, name: str):
+        """Duplicate obj as the only selected and active object, named name."""
+        bpy.ops.object.select_all(action='DESELECT')
+        obj.select_set(True)
+        set_active_by_name(obj.name)
+        bpy.ops.object.duplicate()
+        duplicate = context.active_object
+        duplicate.name = name
+        duplicate.data.name = name
+        return duplicate
+
 
 class WM_OT_exit(Operator):
     bl_idname = 'wm.exit'
@@ -1,17 +1,25 @@
 import bpy
-from operators import AutomateMacro, UV_OT_automate_pack, WM_OT_exit
-import sys
+from operators import AutomateMacro, UV_OT_automate_pack, WM_OT_exit, enable_addons, script_args
+
+
+def define(macro, filepath, margin, heuristic_search_time, scale_heuristic='False', *filepaths):
+    """Pack filepath, then each of filepaths one after another, unloading each mesh once it's exported."""
+    for path in (filepath,) + filepaths:
+        pack = macro.define('UV_OT_automate_pack')
+        pack.properties.filepath = path
+        pack.properties.margin = float(margin)
+        pack.properties.heuristic_search_time = int(heuristic_search_time)
+        pack.properties.scale_heuristic = scale_heuristic == 'True'
+        pack.properties.unload = bool(filepaths)
+    return pack
 
 
 if __name__ == '__main__':
-    filepath, margin, heuristic_search_time = sys.argv[5:]
+    enable_addons()
     bpy.utils.register_class(UV_OT_automate_pack)
     bpy.utils.register_class(AutomateMacro)
     bpy.utils.register_class(WM_OT_exit)
 
-    pack = AutomateMacro.define('UV_OT_automate_pack')
-    pack.properties.filepath = filepath
-    pack.properties.margin = float(margin)
-    pack.properties.heuristic_search_time = int(heuristic_search_time)
+    define(AutomateMacro, *script_args())
     AutomateMacro.define('WM_OT_exit')
     bpy.ops.wm.automation_macro()
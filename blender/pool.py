@@ -0,0 +1,181 @@
+import logging
+import os
+from multiprocessing.connection import Listener
+import socket
+from queue import Queue
+from subprocess import PIPE, Popen, TimeoutExpired
+from threading import Lock
+import time
+
+from blender.launch import POLL_INTERVAL, SCRIPT_DIR, USER_PROFILE, LaunchProfile, ProcessOutput, ProcessResult, \
+    Watchdog, blender_command
+
+
+# seconds a worker Blender has to connect once started, loading its add-ons and opening a window
+SPAWN_TIMEOUT = 300
+
+
+class _Worker:
+    def __init__(self, process: Popen, connection, output: ProcessOutput):
+        self.process = process
+        self.connection = connection
+        self.output = output
+
+    def run(self, python_filename: str, args, events: list, cancel=None, watchdog: Watchdog=None,
+            on_event=None) -> int:
+        """Run a job, appending the events the worker reports to events until it sends the return code.
+         Setting the cancel event or the watchdog expiring kills the worker, recv then raises EOFError."""
+        self.output.stderr.clear()
+        self.connection.send((python_filename, list(map(str, args))))
+        if watchdog is not None:
+            watchdog.start()
+        while True:
+            if not self.connection.poll(POLL_INTERVAL):
+                if (cancel is not None and cancel.is_set()) or (watchdog is not None and watchdog.expired()):
+                    self.process.kill()
+                continue
+            message = self.connection.recv()
+            if isinstance(message, int):
+                return message
+            events.append(message)
+            if watchdog is not None:
+                watchdog.events([message])
+            if on_event is not None:
+                on_event(message)
+
+    def stop(self, timeout=30):
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.connection.close()
+        try:
+            self.process.wait(timeout)
+        except TimeoutExpired:
+            self.process.kill()
+
+
+class WorkerPool:
+    """
+    Long lived Blender processes running worker.py. Stage scripts are sent to an idle worker over a
+     local connection instead of starting a new Blender for every stage, the worker resets its scene
+     between jobs.
+    A worker which exits while running a job, for example through sys.exit(2) in an operator, reports
+     its exit code as the job's return code and is replaced by a new worker. If the new worker fails to
+     start, the next job starts one instead, raising RuntimeError if that fails as well.
+    """
+    def __init__(self, blender_executable: str, size: int, env: dict=None, profile: LaunchProfile=USER_PROFILE,
+                 spawn_timeout: float=SPAWN_TIMEOUT):
+        """
+        :param profile: How the workers are started, they need a window and every add-on a stage uses.
+        :param spawn_timeout: Seconds a worker has to connect before it's killed and RuntimeError is raised.
+        """
+        self.blender_executable = blender_executable
+        self.size = size
+        self.env = env if env is not None else dict(os.environ)
+        self.profile = profile
+        self.spawn_timeout = spawn_timeout
+        self._authkey = os.urandom(16)
+        self._listener = None
+        self._idle = Queue()
+        self._spawn_lock = Lock()
+
+    def start(self):
+        self._listener = Listener(('localhost', 0), authkey=self._authkey)
+        try:
+            for _ in range(self.size):
+                self._idle.put(self._spawn())
+        except Exception:
+            while not self._idle.empty():
+                self._idle.get().stop()
+            self._listener.close()
+            raise
+
+    def close(self):
+        for _ in range(self.size):
+            # None stands in for a worker which failed to restart
+            worker = self._idle.get()
+            if worker is not None:
+                worker.stop()
+        self._listener.close()
+
+    def run(self, python_filename: str, *args, cancel=None, watchdog: Watchdog=None,
+            on_event=None) -> ProcessResult:
+        """
+        :param cancel: threading.Event which kills the worker running the job when set, a new one replaces it.
+        :param watchdog: Watchdog which kills the worker running the job when it expires.
+        :param on_event: Function called with each event as the worker reports it.
+        """
+        worker = self._idle.get()
+        events = []
+        launch_time = time.time()
+        try:
+            if worker is None:
+                worker = self._spawn()
+            returncode = worker.run(python_filename, args, events, cancel, watchdog, on_event)
+            stderr = worker.output.stderr.text()
+        except (EOFError, ConnectionError):
+            returncode = worker.process.wait()
+            worker.output.join()
+            stderr = worker.output.stderr.text()
+            logging.info(f'WORKER {worker.process.pid} EXITED WITH CODE {returncode}, RESTARTING')
+            worker.connection.close()
+            worker = None
+            try:
+                worker = self._spawn()
+            except RuntimeError as error:
+                logging.info(f'WORKER FAILED TO RESTART: {error}')
+        finally:
+            self._idle.put(worker)
+        return ProcessResult([python_filename] + list(args), returncode, stderr=stderr, events=events,
+                             launch_time=launch_time, killed_reason=watchdog.reason if watchdog is not None else None)
+
+    def _spawn(self) -> _Worker:
+        host, port = self._listener.address
+        env = dict(self.profile.env(self.env), PHOTOGRAMMETRY_AUTHKEY=self._authkey.hex())
+        with self._spawn_lock:
+            args = blender_command(self.blender_executable, 'worker.py', host, port, profile=self.profile)
+            process = Popen(args=args, cwd=SCRIPT_DIR, env=env, stdout=PIPE, stderr=PIPE)
+            output = ProcessOutput(f'worker {process.pid}')
+            output.drain(process)
+            try:
+                connection = self._accept(process)
+            except (RuntimeError, EOFError, ConnectionError) as error:
+                process.kill()
+                process.wait()
+                output.join()
+                reason = error if isinstance(error, RuntimeError) else \
+                    f'Worker exited with code {process.returncode} before taking jobs'
+                raise RuntimeError('\n'.join([str(reason), output.stderr.text().rstrip()])) from None
+        return _Worker(process, connection, output)
+
+    def _accept(self, process: Popen):
+        """
+        Connection of the worker process once it's ready to take jobs. Raises RuntimeError if it exits or
+         takes longer than spawn_timeout.
+        """
+        deadline = time.monotonic() + self.spawn_timeout
+        # accept() polls, so an exited worker isn't waited on forever
+        self._listener._listener._socket.settimeout(POLL_INTERVAL)
+        connection = None
+        try:
+            while True:
+                if connection is None:
+                    try:
+                        connection = self._listener.accept()
+                    except socket.timeout:
+                        pass
+                # worker.py sends its pid once it is ready to take jobs
+                elif connection.poll(POLL_INTERVAL):
+                    connection.recv()
+                    return connection
+                if process.poll() is not None:
+                    raise RuntimeError(f'Worker exited with code {process.returncode} before taking jobs')
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f'Worker took over {self.spawn_timeout} seconds to start')
+        except BaseException:
+            if connection is not None:
+                connection.close()
+            raise
+        finally:
+            self._listener._listener._socket.settimeout(None)
@@ -0,0 +1,40 @@
+import bpy
+from operators import AutomateMacro, OBJECT_OT_automate_bake, OBJECT_OT_automate_create_cage, \
+    OBJECT_OT_automate_remesh, OBJECT_OT_generate_lod, UV_OT_automate_pack, UV_OT_automate_unwrap, WM_OT_exit, \
+    enable_addons, script_args
+import bake
+import create_cage
+import generate_lod
+import pack
+import remesh
+import unwrap
+
+
+def define(macro, high_poly_path, low_poly_path, cage_path, texture_output_path, base_texture_name, map_types,
+           width, height, margin, tile_x, tile_y, target_count, adaptive_size, hard_edges_by_angle,
+           disallow_intersecting, pack_margin, heuristic_search_time, lod_path, number_of_levels, level_ratio,
+           checkpoints, threads=0):
+    """Chain every stage in one session. Objects stay in bpy.data between stages, the low poly is only
+     exported after the stages named in the comma separated checkpoints and once baked."""
+    checkpoints = checkpoints.split(',')
+    remesh.define(macro, high_poly_path, low_poly_path, target_count, adaptive_size, hard_edges_by_angle,
+                  disallow_intersecting).properties.export = 'remesh' in checkpoints
+    unwrap.define(macro, low_poly_path).properties.export = 'unwrap' in checkpoints
+    pack.define(macro, low_poly_path, pack_margin, heuristic_search_time).properties.export = 'pack' in checkpoints
+    create_cage.define(macro, high_poly_path, low_poly_path, cage_path)
+    bake.define(macro, high_poly_path, low_poly_path, cage_path, texture_output_path, base_texture_name,
+                map_types, width, height, margin, tile_x, tile_y, threads)
+    if lod_path:
+        generate_lod.define(macro, low_poly_path, lod_path, number_of_levels, level_ratio)
+
+
+if __name__ == '__main__':
+    enable_addons()
+    for operator in (OBJECT_OT_automate_remesh, UV_OT_automate_unwrap, UV_OT_automate_pack,
+                     OBJECT_OT_automate_create_cage, OBJECT_OT_automate_bake, OBJECT_OT_generate_lod,
+                     WM_OT_exit, AutomateMacro):
+        bpy.utils.register_class(operator)
+
+    define(AutomateMacro, *script_args())
+    AutomateMacro.define('WM_OT_exit')
+    bpy.ops.wm.automation_macro()
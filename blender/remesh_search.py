@@ -0,0 +1,80 @@
+import os
+from pathlib import Path
+import shutil
+from threading import Event
+from typing import Optional
+
+
+# (target_count scale, adaptive_size increase) of the default candidates, in order of preference
+_CANDIDATE_STEPS = ((1, 0), (1, 25), (1.25, 0), (1.25, 25), (1.5, 25), (2, 50))
+_MAX_ADAPTIVE_SIZE = 100
+
+
+def remesh_candidates(target_count: int, adaptive_size: int, count=4) -> list:
+    """
+    (target_count, adaptive_size) pairs to remesh with, closest to the requested ones first. Raising
+     either makes QuadRemesher less likely to fold the mesh into itself.
+    """
+    candidates = []
+    for scale, increase in _CANDIDATE_STEPS:
+        candidate = (int(target_count * scale), min(adaptive_size + increase, _MAX_ADAPTIVE_SIZE))
+        if candidate not in candidates:
+            candidates.append(candidate)
+    return candidates[:count]
+
+
+class RemeshSearch:
+    """
+    Remesh candidates running at the same time, each exporting to a folder of its own in search_dir.
+    Candidates are in order of preference. One which didn't self intersect and exported its low poly wins
+     once every candidate before it failed. One whose target_count is within tolerance of the requested
+     target_count only waits for the candidates before it which are within tolerance as well.
+    """
+    def __init__(self, candidates: list, stages: list, low_poly_outputs: list, target_count: int,
+                 tolerance: float, search_dir: Path, cancel: Event):
+        self.candidates = candidates
+        self.stages = stages
+        self.low_poly_outputs = low_poly_outputs
+        self.target_count = target_count
+        self.tolerance = tolerance
+        self.search_dir = search_dir
+        self.cancel = cancel
+        self.finished = [False] * len(candidates)
+        self.errors = [None] * len(candidates)
+
+    def finish(self, index: int, error: Optional[Exception]) -> Optional[int]:
+        """Record that candidate index finished, with the error it raised or None. Returns the winner, if decided."""
+        if error is None and not Path(self.stages[index].output_paths[0]).exists():
+            error = FileNotFoundError(f'{self.stages[index].name} exported no low poly.')
+        self.finished[index] = True
+        self.errors[index] = error
+        if error is None and self._within_tolerance(index) and \
+                all(self.finished[i] for i in range(index) if self._within_tolerance(i)) and \
+                all(self.errors[i] is not None for i in range(index) if self.finished[i]):
+            return index
+        for i, finished in enumerate(self.finished):
+            if not finished:
+                return None
+            if self.errors[i] is None:
+                return i
+        return None
+
+    def _within_tolerance(self, index: int) -> bool:
+        return abs(self.candidates[index][0] / self.target_count - 1) <= self.tolerance
+
+    def keep(self, index: int) -> tuple:
+        """Move the outputs of candidate index to the low poly's path, returns its (target_count, adaptive_size)."""
+        for candidate_path, path in zip(self.stages[index].output_paths, self.low_poly_outputs):
+            if Path(candidate_path).exists():
+                os.replace(candidate_path, path)
+        return self.candidates[index]
+
+    def error(self, default: Exception) -> Exception:
+        """Error to raise when no candidate won, the first which isn't default's type, otherwise default."""
+        for error in self.errors:
+            if error is not None and not isinstance(error, type(default)):
+                return error
+        return default
+
+    def remove(self):
+        shutil.rmtree(self.search_dir, ignore_errors=True)
@@ -0,0 +1,70 @@
+import logging
+import os
+from pathlib import Path
+from threading import Condition
+
+
+# memory of Blender itself with nothing loaded
+_BLENDER_MEMORY = 400 * 2**20
+# bytes of memory per byte of .obj, for the imported mesh, its undo copy and a BVH tree
+_OBJ_MEMORY_RATIO = 3
+# bytes per texture pixel, a float render buffer and the image
+_PIXEL_MEMORY = 20
+
+
+class MemoryScheduler:
+    """
+    Admits stages to run while the sum of their estimated peak memory stays under budget bytes.
+    A stage is estimated from the size of its input meshes and the texture pixels it bakes, multiplied
+     by a factor for its script learnt from the peak memory measured for its earlier runs.
+    """
+    def __init__(self, budget: int, learning_rate=.5):
+        """
+        :param budget: Bytes of memory the running stages may use together.
+        :param learning_rate: Weight of the latest measured run in a script's correction factor.
+        """
+        self.budget = budget
+        self.learning_rate = learning_rate
+        self.factors = {}
+        self._in_use = 0
+        self._condition = Condition()
+
+    def base_estimate(self, input_paths, texture_pixels=0) -> int:
+        """Estimated peak memory in bytes of a stage, before correction."""
+        mesh_bytes = sum(os.path.getsize(path) for path in input_paths
+                         if Path(path).suffix == '.obj' and Path(path).exists())
+        return _BLENDER_MEMORY + mesh_bytes * _OBJ_MEMORY_RATIO + texture_pixels * _PIXEL_MEMORY
+
+    def estimate(self, python_filename: str, base_estimate: int) -> int:
+        return int(base_estimate * self.factors.get(python_filename, 1.))
+
+    def try_acquire(self, estimate: int) -> bool:
+        """
+        Reserve estimate bytes of the budget if they fit. A stage is always admitted when nothing else runs,
+         so a stage estimated to need more than the budget doesn't wait forever.
+        """
+        with self._condition:
+            if self._in_use > 0 and self._in_use + estimate > self.budget:
+                return False
+            self._in_use += estimate
+            return True
+
+    def acquire(self, estimate: int):
+        """Block until estimate bytes of the budget are reserved."""
+        with self._condition:
+            self._condition.wait_for(lambda: self.try_acquire(estimate))
+
+    def release(self, estimate: int):
+        with self._condition:
+            self._in_use -= estimate
+            self._condition.notify_all()
+
+    def learn(self, python_filename: str, base_estimate: int, peak_rss):
+        """Correct the estimates of python_filename with the peak memory measured for a run, if any."""
+        if not peak_rss:
+            return
+        ratio = peak_rss / base_estimate
+        with self._condition:
+            factor = self.factors.get(python_filename, ratio)
+            self.factors[python_filename] = factor + self.learning_rate * (ratio - factor)
+        logging.debug(f'MEMORY FACTOR OF {python_filename}: {self.factors[python_filename]:.2f}')
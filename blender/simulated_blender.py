@@ -0,0 +1,228 @@
+import json
+import os
+from pathlib import Path
+import random
+import shutil
+import sys
+import time
+
+from blender.launch import blender_executable
+from blender.obj_scan import scan_obj
+from blender.synthetic import write_sphere
+
+
+# script: (seconds, seconds per million triangles of its input meshes), about what each stage takes on a desktop
+STAGE_SECONDS = {
+    'remesh.py': (15., 60.), 'unwrap.py': (3., 30.), 'pack.py': (1., 5.), 'create_cage.py': (2., 20.),
+    'bake.py': (10., 40.), 'bake_material.py': (2., 0.), 'generate_lod.py': (1., 10.),
+    'process_asset.py': (30., 150.),
+}
+# seconds bake.py and process_asset.py take per megapixel of each map they bake
+BAKE_SECONDS_PER_MEGAPIXEL = 4.
+STARTUP_SECONDS = 2.
+# script: (step, fraction of the stage's time) reported as timing events, mirrors the steps operators.py times
+_STAGE_STEPS = {
+    'remesh.py': [('import', .05), ('quadremesher', .85), ('intersection check', .05), ('export', .05)],
+    'unwrap.py': [('import', .1), ('auto seams unwrap', .8), ('export', .1)],
+    'pack.py': [('import', .05), ('count islands', .02), ('uvpackmaster', .88), ('export', .05)],
+    'create_cage.py': [('import', .1), ('intersection check', .05), ('raycast', .35), ('inflate', .4),
+                       ('export', .1)],
+    'bake_material.py': [('import', .2), ('export', .8)],
+    'generate_lod.py': [('import', .2), ('decimate and export', .8)],
+}
+# mirrors operators._HEARTBEAT_INTERVAL
+_HEARTBEAT_INTERVAL = 2.
+# texture_format: extension, mirrors operators.TEXTURE_FORMATS
+_TEXTURE_EXTENSIONS = {'PNG': '.png', 'PNG16': '.png', 'EXR_HALF': '.exr', 'EXR': '.exr', 'TIFF': '.tif'}
+
+
+def write_simulated_blender(directory, speed=1., seconds: dict=None, failure_rate=0., seed=None) -> Path:
+    """
+    Write a stand-in Blender executable to directory, which replays how long each stage script takes instead
+     of running it, and writes the files the stage would. Blender(directory) then runs batches, worker
+     pools and schedulers without Blender, QuadRemesher or UVPackmaster installed, or a GPU. Linux and macOS.
+    Bakes write whole textures, so bakes with regions or encode_on_host aren't simulated.
+    :param speed: How many times faster than STAGE_SECONDS stages finish, startup included.
+    :param seconds: Script: (seconds, seconds per million triangles), merged into STAGE_SECONDS.
+    :param failure_rate: Fraction of stages which exit with an error instead of writing their outputs.
+    :param seed: Seed of the failures, None picks different stages to fail every run.
+    :return: Path of the executable.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    settings = {'speed': speed, 'seconds': dict(STAGE_SECONDS, **(seconds or {})), 'failure_rate': failure_rate,
+                'seed': seed}
+    executable_path = directory / 'blender'
+    executable_path.write_text(
+        f'#!{sys.executable}\n'
+        'import sys\n'
+        f'sys.path.insert(0, {str(Path(__file__).resolve().parent.parent)!r})\n'
+        'from blender.simulated_blender import main\n'
+        f'main({json.dumps(settings)!r})\n')
+    executable_path.chmod(0o755)
+    return executable_path
+
+
+def is_simulated(blender_path) -> bool:
+    """Whether the Blender at blender_path was written by write_simulated_blender."""
+    try:
+        with open(blender_executable(str(blender_path)), 'rb') as executable:
+            return b'blender.simulated_blender' in executable.read(4096)
+    except OSError:
+        return False
+
+
+class SimulatedStage:
+    """Replays one run of a stage script, reporting events through emit like operators.emit does."""
+    def __init__(self, settings: dict, emit):
+        self.settings = settings
+        self.emit = emit
+
+    def run(self, python_filename: str, args: list) -> int:
+        script = Path(python_filename).name
+        stage = Path(python_filename).stem
+        self.emit('started', stage=stage)
+        inputs, write_outputs = _stage_files(script, args)
+        triangles = sum(scan_obj(path, bounds=False).triangles for path in inputs if Path(path).exists())
+        base_seconds, seconds_per_million = self.settings['seconds'].get(script, (1., 0.))
+        seconds = base_seconds + seconds_per_million * triangles / 1e6
+        steps = _STAGE_STEPS.get(script, [('simulated', 1.)])
+        if script in ('bake.py', 'process_asset.py'):
+            bake_seconds, steps = _bake_steps(script, args)
+            seconds += bake_seconds
+        if script == 'pack.py':
+            # the heuristic search time of each mesh
+            seconds += int(args[2]) * (1 + len(args[4:]))
+
+        for step, fraction in steps:
+            step_seconds = seconds * fraction / self.settings['speed']
+            self._sleep(stage, step_seconds)
+            self.emit('timing', stage=stage, step=step, seconds=step_seconds)
+        # seeded by the run's arguments as well, so with a seed the same stages fail every time
+        seed = None if self.settings['seed'] is None else f"{self.settings['seed']} {script} {' '.join(args)}"
+        if random.Random(seed).random() < self.settings['failure_rate']:
+            self.emit('error', stage=stage, message='simulated failure')
+            return 1
+        output_triangles = write_outputs()
+        self.emit('stage', stage=stage, peak_rss=2**28 + 200 * triangles, input_triangles=triangles,
+                  output_triangles=output_triangles)
+        return 0
+
+    def _sleep(self, stage: str, seconds: float):
+        """Sleep, sending heartbeats like a stage waiting on an add-on does."""
+        end = time.perf_counter() + seconds
+        while True:
+            remaining = end - time.perf_counter()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, _HEARTBEAT_INTERVAL))
+            self.emit('heartbeat', stage=stage)
+
+
+def _stage_files(script: str, args: list) -> tuple:
+    """(input meshes, function writing the stage's outputs and returning their triangles) of a stage run."""
+    def copy(source, destination) -> int:
+        if Path(source).resolve() != Path(destination).resolve():
+            shutil.copyfile(source, destination)
+        _write_mtl(destination)
+        return scan_obj(destination, bounds=False).triangles
+
+    def touch(*paths) -> int:
+        for path in paths:
+            os.utime(path)
+            _write_mtl(path)
+        return sum(scan_obj(path, bounds=False).triangles for path in paths)
+
+    if script == 'remesh.py':
+        return [args[0]], lambda: _write_low_poly(args[1], int(args[2]))
+    if script == 'unwrap.py':
+        return [args[0]], lambda: touch(args[0])
+    if script == 'pack.py':
+        return [args[0]] + args[4:], lambda: touch(args[0], *args[4:])
+    if script == 'create_cage.py':
+        return args[:2], lambda: copy(args[1], args[2])
+    if script == 'bake.py':
+        texture_format = args[14] if len(args) > 14 else 'PNG'
+        return args[:3], lambda: _write_textures(args[3], args[4], args[5], texture_format)
+    if script == 'bake_material.py':
+        texture_format = args[4] if len(args) > 4 else 'PNG'
+        return args[:1], lambda: _write_textures(args[1], args[2], args[3], texture_format)
+    if script == 'generate_lod.py':
+        pairs = list(zip([args[0]] + args[5::2], [args[1]] + args[6::2]))
+        return [low for low, _ in pairs], lambda: sum(copy(low, output) for low, output in pairs)
+    if script == 'process_asset.py':
+        def write_outputs() -> int:
+            triangles = _write_low_poly(args[1], int(args[11]))
+            copy(args[1], args[2])
+            _write_textures(args[3], args[4], args[5])
+            if args[17]:
+                copy(args[1], args[17])
+            return triangles
+        return args[:1], write_outputs
+    return [], lambda: 0
+
+
+def _bake_steps(script: str, args: list) -> tuple:
+    """(seconds, steps) of baking each map, on top of the stage's own time."""
+    map_types = args[5].split()
+    megapixels = int(args[6]) * int(args[7]) / 1e6
+    seconds = BAKE_SECONDS_PER_MEGAPIXEL * megapixels * len(map_types)
+    if script == 'process_asset.py':
+        return seconds, [('simulated', 1.)]
+    steps = [('import', .05)] + [(f'bake {map_type}', .9 / len(map_types)) for map_type in map_types]
+    return seconds, steps + [('export', .05)]
+
+
+def _write_low_poly(path, target_count: int) -> int:
+    """Write a sphere with about target_count quads, as QuadRemesher would, returning its triangles."""
+    rings = max(2, round((target_count / 2) ** .5))
+    write_sphere(path, rings, 2 * rings)
+    _write_mtl(path)
+    # the faces at the poles are triangles
+    return 4 * rings * (rings - 1)
+
+
+def _write_mtl(obj_path):
+    """Write the .mtl Blender exports alongside an .obj."""
+    if Path(obj_path).suffix == '.obj':
+        Path(obj_path).with_suffix('.mtl').write_text(f'newmtl {Path(obj_path).stem}\n')
+
+
+def _write_textures(texture_output_path, base_texture_name: str, map_types: str, texture_format='PNG') -> int:
+    """Write a placeholder for each texture, the host only checks that they exist."""
+    Path(texture_output_path).mkdir(parents=True, exist_ok=True)
+    for map_type in map_types.split():
+        texture_path = Path(texture_output_path) / \
+            f'{base_texture_name}_{map_type.lower()}{_TEXTURE_EXTENSIONS[texture_format]}'
+        texture_path.write_bytes(b'simulated texture\n')
+    return 0
+
+
+def main(settings: str):
+    """Run like Blender does when started by blender.launch.blender_command, with settings as JSON."""
+    settings = json.loads(settings)
+    python_filename = sys.argv[sys.argv.index('--python') + 1]
+    args = sys.argv[sys.argv.index('--') + 1:]
+    time.sleep(STARTUP_SECONDS / settings['speed'])
+    print('Blender (simulated)', flush=True)
+
+    if Path(python_filename).name == 'worker.py':
+        from multiprocessing.connection import Client
+        host, port = args
+        connection = Client((host, int(port)), authkey=bytes.fromhex(os.environ['PHOTOGRAMMETRY_AUTHKEY']))
+        stage = SimulatedStage(settings, lambda event, **fields: connection.send(
+            dict(fields, event=event, time=time.time())))
+        connection.send(os.getpid())
+        while True:
+            job = connection.recv()
+            if job is None:
+                sys.exit(0)
+            connection.send(stage.run(*job))
+
+    def emit(event: str, **fields):
+        events_path = os.environ.get('PHOTOGRAMMETRY_EVENTS')
+        if events_path:
+            with open(events_path, 'a') as events_file:
+                events_file.write(json.dumps(dict(fields, event=event, time=time.time())) + '\n')
+
+    sys.exit(SimulatedStage(settings, emit).run(python_filename, args))
@@ -0,0 +1,126 @@
+import math
+from pathlib import Path
+import random
+
+
+def write_sphere(path, rings: int, segments: int, radius=1., bumps=0., bump_frequency=12, noise=0., seed=0):
+    """
+    Write a UV sphere with lat-long UVs as an .obj whose object is named after the file, like the stages
+     expect of their inputs. The seam and poles are welded, only their UVs are split, so faces meeting
+     there share vertices and aren't taken for self intersections.
+    :param rings: Quads from pole to pole.
+    :param segments: Quads around the equator.
+    :param bumps: Height of a pattern of bumps, as a fraction of radius, giving a high poly detail to bake.
+    :param bump_frequency: Bumps around the equator.
+    :param noise: Most a vertex is moved in or out at random, as a fraction of radius, like the noise of a scan.
+    :param seed: Seed of the noise, the same seed writes the same sphere.
+    """
+    noise_source = random.Random(seed)
+
+    def point(u: float, v: float) -> tuple:
+        theta, phi = math.pi * v, 2 * math.pi * u
+        r = radius * (1 + bumps * math.sin(bump_frequency * phi) * math.sin(bump_frequency * theta))
+        r += radius * noise * noise_source.uniform(-1, 1)
+        return r * math.sin(theta) * math.cos(phi), r * math.cos(theta), r * math.sin(theta) * math.sin(phi)
+
+    _write_grid_mesh(path, rings, segments, point, closed=True)
+
+
+def write_displaced_grid(path, rows: int, columns: int, size=2., height=.2, waves=3, noise=0., seed=0):
+    """
+    Write a square grid displaced by a few overlapping waves as an .obj, like the scan of a patch of ground
+     or a wall, with planar UVs.
+    :param rows: Quads along one side.
+    :param columns: Quads along the other side.
+    :param height: Height of the waves.
+    :param waves: Waves across the grid.
+    :param noise: Most a vertex is moved up or down at random, as a fraction of size.
+    """
+    noise_source = random.Random(seed)
+
+    def point(u: float, v: float) -> tuple:
+        z = height * (math.sin(waves * math.pi * u) * math.cos(waves * math.pi * v) +
+                      .5 * math.sin(2.3 * waves * math.pi * (u + v)))
+        return (u - .5) * size, z + size * noise * noise_source.uniform(-1, 1), (v - .5) * size
+
+    _write_grid_mesh(path, rows, columns, point)
+
+
+def _write_grid_mesh(path, rows: int, columns: int, point, closed=False):
+    """
+    Write a rows by columns grid of quads whose corners are at point(u, v), u and v going from 0 to 1.
+    :param closed: Wrap the grid around into a sphere, welding the columns at u 0 and 1 and each of the
+     rows at v 0 and 1 into one vertex, the poles, whose faces are triangles.
+    """
+    path = Path(path)
+    lines = [f'o {path.stem}']
+    vertex_indices = {}
+    for row in range(rows + 1):
+        for column in range(columns + 1):
+            key = (row, column)
+            if closed:
+                key = (row, 0) if row in (0, rows) else (row, column % columns)
+            if key not in vertex_indices:
+                # 1 based
+                vertex_indices[key] = len(vertex_indices) + 1
+                x, y, z = point(key[1] / columns, row / rows)
+                lines.append(f'v {x:.6f} {y:.6f} {z:.6f}')
+            vertex_indices[row, column] = vertex_indices[key]
+    for row in range(rows + 1):
+        for column in range(columns + 1):
+            lines.append(f'vt {column / columns:.6f} {1 - row / rows:.6f}')
+    width = columns + 1
+    for row in range(rows):
+        for column in range(columns):
+            corners = [(row, column), (row + 1, column), (row + 1, column + 1), (row, column + 1)]
+            face = []
+            for corner in corners:
+                vertex = vertex_indices[corner]
+                # a pole's corners are one vertex, keep it once
+                if not face or face[-1][0] != vertex:
+                    face.append((vertex, corner[0] * width + corner[1] + 1))
+            if len(face) > 3 and face[0][0] == face[-1][0]:
+                face.pop()
+            lines.append('f ' + ' '.join(f'{vertex}/{uv}' for vertex, uv in face))
+    path.write_text('\n'.join(lines) + '\n')
+
+
+def write_bake_scene(directory, high_poly_rings=512, low_poly_rings=32) -> tuple:
+    """
+    Write a bumpy high poly sphere, a smooth low poly sphere and a cage around both to directory, for
+     calibration bakes which should take about as long as a scan of similar density.
+    :return: (high poly path, low poly path, cage path)
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    high_poly_path = directory / 'synthetic_high.obj'
+    low_poly_path = directory / 'synthetic_low.obj'
+    cage_path = directory / 'synthetic_cage.obj'
+    write_sphere(high_poly_path, high_poly_rings, 2 * high_poly_rings, bumps=.02)
+    write_sphere(low_poly_path, low_poly_rings, 2 * low_poly_rings)
+    write_sphere(cage_path, low_poly_rings, 2 * low_poly_rings, radius=1.05)
+    return high_poly_path, low_poly_path, cage_path
+
+
+def write_scan_pair(directory, name: str, shape='sphere', density=256, seed=0) -> tuple:
+    """
+    Write a noisy high poly scan and a smooth low poly of the same shape to directory, as name_high.obj and
+     name_low.obj.
+    :param shape: 'sphere' for a closed object, 'grid' for an open patch of displaced ground.
+    :param density: Quads along the high poly, from pole to pole or along a side. The low poly has 1/8th.
+    :return: (high poly path, low poly path)
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    high_poly_path = directory / f'{name}_high.obj'
+    low_poly_path = directory / f'{name}_low.obj'
+    low_density = max(4, density // 8)
+    if shape == 'sphere':
+        write_sphere(high_poly_path, density, 2 * density, bumps=.02, noise=.003, seed=seed)
+        write_sphere(low_poly_path, low_density, 2 * low_density)
+    elif shape == 'grid':
+        write_displaced_grid(high_poly_path, density, density, noise=.002, seed=seed)
+        write_displaced_grid(low_poly_path, low_density, low_density)
+    else:
+        raise ValueError(f'Unknown shape: {shape}, expected sphere or grid.')
+    return high_poly_path, low_poly_path
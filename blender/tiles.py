@@ -0,0 +1,132 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+from pathlib import Path
+import struct
+from threading import Event, Thread
+import zlib
+
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+_IDAT_SIZE = 2**20
+
+
+def region_windows(width: int, height: int, regions: int) -> list:
+    """
+    A regions x regions grid of (x0, y0, x1, y1) pixel windows covering a width x height texture,
+     with y going up from the bottom row like Blender's images.
+    """
+    xs = [width * i // regions for i in range(regions + 1)]
+    ys = [height * i // regions for i in range(regions + 1)]
+    return [(xs[i], ys[j], xs[i + 1], ys[j + 1]) for j in range(regions) for i in range(regions)]
+
+
+def tile_path(texture_path, window) -> Path:
+    """Where Blender writes the pixels of texture_path within window for the host, see operators.write_region_tile."""
+    x0, y0, _, _ = window
+    return Path(f'{texture_path}.{x0}_{y0}.rgba')
+
+
+def stitch_png(texture_path, width: int, height: int, windows, bit_depth=8, remove_tiles=True):
+    """
+    Write the RGBA tiles of windows, which cover the texture, as the PNG texture_path and remove them.
+    Rows are compressed as they are read, so only one row of the texture is held in memory.
+    :param bit_depth: 8 or 16, bits per channel of the tiles, 16 bit samples are big endian.
+    :param remove_tiles: Remove the tiles once the texture is written.
+    """
+    texture_path = Path(texture_path)
+    partial_path = texture_path.with_name(f'{texture_path.name}.{os.getpid()}.partial')
+    bands = {}
+    for window in windows:
+        bands.setdefault((window[1], window[3]), []).append(window)
+
+    compressor = zlib.compressobj(6)
+    with open(partial_path, 'wb') as png:
+        png.write(_PNG_SIGNATURE)
+        _write_chunk(png, b'IHDR', struct.pack('>IIBBBBB', width, height, bit_depth, 6, 0, 0, 0))
+        idat = bytearray()
+        # PNG rows go top to bottom, the tiles' rows already do
+        for y0, y1 in sorted(bands, reverse=True):
+            band = sorted(bands[y0, y1])
+            tiles = [open(tile_path(texture_path, window), 'rb') for window in band]
+            try:
+                row_sizes = [(x1 - x0) * bit_depth // 2 for x0, _, x1, _ in band]
+                for _ in range(y1 - y0):
+                    # filter type 0, the row as is
+                    row = b'\x00' + b''.join(tile.read(size) for tile, size in zip(tiles, row_sizes))
+                    idat += compressor.compress(row)
+                    if len(idat) >= _IDAT_SIZE:
+                        _write_chunk(png, b'IDAT', idat)
+                        idat = bytearray()
+            finally:
+                for tile in tiles:
+                    tile.close()
+        idat += compressor.flush()
+        _write_chunk(png, b'IDAT', idat)
+        _write_chunk(png, b'IEND', b'')
+    os.replace(partial_path, texture_path)
+
+    if remove_tiles:
+        for window in windows:
+            tile_path(texture_path, window).unlink()
+
+
+class TileEncoder:
+    """
+    Encodes textures with stitch_png on a pool of threads, each as soon as all of its tiles have been
+     written, so a texture is compressed while Blender bakes the next map or region.
+    Tiles are only removed by wait, once the stages writing them finished and stored them in the cache.
+    """
+    def __init__(self, texture_paths, width: int, height: int, windows, bit_depth=8, poll_interval=.1):
+        self.width = width
+        self.height = height
+        self.windows = windows
+        self.bit_depth = bit_depth
+        self.poll_interval = poll_interval
+        self._pending = list(texture_paths)
+        self._futures = []
+        self._executor = ThreadPoolExecutor()
+        self._stopped = Event()
+        self._thread = Thread(target=self._poll, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Stop waiting for tiles, textures whose tiles are all written by now are still encoded."""
+        self._stopped.set()
+        self._thread.join()
+
+    def wait(self):
+        """Wait for the textures to be encoded, raises FileNotFoundError if any of their tiles weren't written."""
+        try:
+            for future in self._futures:
+                texture_path = future.result()
+                for window in self.windows:
+                    tile_path(texture_path, window).unlink()
+        finally:
+            self._executor.shutdown()
+        if self._pending:
+            raise FileNotFoundError(f'Tiles were not written for: {", ".join(map(str, self._pending))}')
+
+    def _stitch(self, texture_path) -> Path:
+        stitch_png(texture_path, self.width, self.height, self.windows, self.bit_depth, remove_tiles=False)
+        return texture_path
+
+    def _poll(self):
+        while True:
+            # checked before submitting, so tiles written just before stop are submitted too
+            stopped = self._stopped.is_set()
+            for texture_path in list(self._pending):
+                if all(tile_path(texture_path, window).exists() for window in self.windows):
+                    self._pending.remove(texture_path)
+                    self._futures.append(self._executor.submit(self._stitch, texture_path))
+            if stopped or not self._pending:
+                return
+            self._stopped.wait(self.poll_interval)
+
+
+def _write_chunk(png, chunk_type: bytes, data: bytes):
+    png.write(struct.pack('>I', len(data)))
+    png.write(chunk_type)
+    png.write(data)
+    png.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type))))
@@ -1,15 +1,19 @@
 import bpy
-from operators import AutomateMacro, UV_OT_automate_unwrap, WM_OT_exit
-import sys
+from operators import AutomateMacro, UV_OT_automate_unwrap, WM_OT_exit, enable_addons, script_args
+
+
+def define(macro, filepath):
+    unwrap = macro.define('UV_OT_automate_unwrap')
+    unwrap.properties.filepath = filepath
+    return unwrap
 
 
 if __name__ == '__main__':
-    filepath = sys.argv[-1]
+    enable_addons()
     bpy.utils.register_class(UV_OT_automate_unwrap)
     bpy.utils.register_class(WM_OT_exit)
     bpy.utils.register_class(AutomateMacro)
 
-    unwrap = AutomateMacro.define('UV_OT_automate_unwrap')
-    unwrap.properties.filepath = filepath
+    define(AutomateMacro, *script_args())
     AutomateMacro.define('WM_OT_exit')
-    bpy.ops.wm.automation_macro()
\ No newline at end of file
+    bpy.ops.wm.automation_macro()
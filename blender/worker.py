@@ -0,0 +1,94 @@
+import bpy
+from bpy.types import Operator
+import importlib
+from multiprocessing.connection import Client
+import os
+from pathlib import Path
+from operators import OBJECT_OT_automate_bake, OBJECT_OT_automate_bake_material, OBJECT_OT_automate_create_cage, \
+    OBJECT_OT_automate_remesh, OBJECT_OT_generate_lod, UV_OT_automate_pack, UV_OT_automate_unwrap, reset_scene, \
+    emit_error, enable_addons, reset_peak_rss, script_args, set_event_sink
+
+
+_POLL_INTERVAL = .05
+
+
+class Worker:
+    """Receives (python_filename, args) jobs from blender.pool.WorkerPool and runs the stage script's
+     operators in this Blender session, reporting its events and a return code for each job."""
+    def __init__(self, connection):
+        self.connection = connection
+        self.busy = False
+        self.job_count = 0
+        self.macro = None
+
+    def poll(self):
+        if self.busy or not self.connection.poll():
+            return _POLL_INTERVAL
+        job = self.connection.recv()
+        if job is None:
+            call_in_window(bpy.ops.wm.quit_blender)
+            return None
+        self.run(*job)
+        return _POLL_INTERVAL
+
+    def run(self, python_filename: str, args: list):
+        self.busy = True
+        reset_scene()
+        # the peak memory of this job, not the largest of the jobs before it
+        reset_peak_rss()
+        if self.macro is not None:
+            bpy.utils.unregister_class(self.macro)
+
+        # a macro's steps can't be redefined, so every job gets its own
+        self.job_count += 1
+        self.macro = type(f'WM_OT_automation_job_{self.job_count}', (bpy.types.Macro,),
+                          {'bl_idname': f'wm.automation_job_{self.job_count}', 'bl_label': 'Automation Job'})
+        bpy.utils.register_class(self.macro)
+        stage = importlib.import_module(Path(python_filename).stem)
+        stage.define(self.macro, *args)
+        self.macro.define('WM_OT_job_done')
+        try:
+            call_in_window(getattr(bpy.ops.wm, f'automation_job_{self.job_count}'))
+        except RuntimeError as error:
+            emit_error(Path(python_filename).stem, str(error))
+            self.done(1)
+
+    def done(self, returncode: int):
+        self.connection.send(returncode)
+        self.busy = False
+
+
+class WM_OT_job_done(Operator):
+    bl_idname = 'wm.job_done'
+    bl_label = 'Report Job Done'
+
+    def execute(self, context):
+        worker.done(0)
+        return {'FINISHED'}
+
+
+def call_in_window(operator):
+    """Timers run without a window in context, which modal operators need."""
+    window = bpy.context.window_manager.windows[0]
+    override = {'window': window, 'screen': window.screen}
+    if hasattr(bpy.context, 'temp_override'):
+        with bpy.context.temp_override(**override):
+            return operator()
+    return operator(override)
+
+
+if __name__ == '__main__':
+    # a pool which only bakes doesn't need QuadRemesher or UVPackmaster
+    enable_addons(required=False)
+    host, port = script_args()
+    connection = Client((host, int(port)), authkey=bytes.fromhex(os.environ['PHOTOGRAMMETRY_AUTHKEY']))
+
+    for operator in (OBJECT_OT_automate_remesh, UV_OT_automate_unwrap, UV_OT_automate_pack,
+                     OBJECT_OT_automate_create_cage, OBJECT_OT_automate_bake, OBJECT_OT_automate_bake_material,
+                     OBJECT_OT_generate_lod, WM_OT_job_done):
+        bpy.utils.register_class(operator)
+
+    worker = Worker(connection)
+    set_event_sink(connection.send)
+    bpy.app.timers.register(worker.poll, first_interval=_POLL_INTERVAL, persistent=True)
+    connection.send(os.getpid())